@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+# Sprite animation for Pixel Peak.
+#
+# Every animation in the game is one of the Clips below: a fixed sequence of frames, each
+# shown for its own duration. A body holds an AnimationCursor saying which clip it plays,
+# which frame it is on and how long that frame has left; the simulation only switches
+# clips when something happens (a jump, a landing, a turn, a squash) and World.step()
+# moves every cursor forward in one advance_cursors() pass per tick.
+#
+# Frames are named by sprite so this module stays free of pygame like world.py. main.py
+# calls resolve_clips() once to turn each clip into its surfaces, and draws a body with
+# frames[cursor.clip][cursor.frame_index] - no image names are looked up while playing.
+
+
+class Clip:
+    __slots__ = ('frames', 'durations')
+
+    def __init__(self, frames, durations):
+        # durations is either one value for every frame or one per frame, in seconds.
+        self.frames = tuple(frames)
+        if isinstance(durations, (int, float)):
+            durations = [durations] * len(self.frames)
+        self.durations = tuple(durations)
+
+    def __repr__(self):
+        return f"Clip({self.frames!r}, {self.durations!r})"
+
+
+# --- Clips ---
+# Mirrored clips (walking left/right) have the same frame count and timing, so a body
+# can turn around without its walk cycle skipping.
+PLAYER_IDLE = Clip(["player_idle_0", "player_idle_1"], 0.5)
+PLAYER_WALK_RIGHT = Clip(["player_right"], 0)
+PLAYER_WALK_LEFT = Clip(["player_left"], 0)
+PLAYER_JUMP = Clip(["player_jump"], 0)
+ENEMY_WALK_RIGHT = Clip(["enemy_walk_right_0", "enemy_walk_right_1"], 0.4)
+ENEMY_WALK_LEFT = Clip(["enemy_walk_left_0", "enemy_walk_left_1"], 0.4)
+ENEMY_SQUASHED = Clip(["enemy_squashed"], 0)
+FLAG_WAVE = Clip(["flag_0", "flag_1"], 0.3)
+
+CLIPS = (PLAYER_IDLE, PLAYER_WALK_RIGHT, PLAYER_WALK_LEFT, PLAYER_JUMP,
+         ENEMY_WALK_RIGHT, ENEMY_WALK_LEFT, ENEMY_SQUASHED, FLAG_WAVE)
+
+def clip_sprite_names(clips=CLIPS):
+    names = []
+    for clip in clips:
+        names.extend(name for name in clip.frames if name not in names)
+    return names
+
+def resolve_clips(load_frame, clips=CLIPS):
+    # {clip: (frame, ...)} with every sprite name passed through load_frame once.
+    return {clip: tuple(load_frame(name) for name in clip.frames) for clip in clips}
+
+
+# --- Playback ---
+class AnimationCursor:
+    __slots__ = ('clip', 'frame_index', 'time_left', 'playing')
+
+    def __init__(self, clip):
+        self.clip = None
+        self.play(clip)
+
+    def play(self, clip, restart=True):
+        # Switches to clip; playing the current clip again changes nothing. With
+        # restart=False the frame and its remaining time carry over (for mirrored clips).
+        if clip is self.clip:
+            return
+        if restart or self.clip is None:
+            self.frame_index = 0
+            self.time_left = clip.durations[0]
+        self.clip = clip
+        # Single-frame clips never need advancing.
+        self.playing = len(clip.frames) > 1
+
+    def stop(self):
+        self.playing = False
+
+    # Plain tuples for world snapshots; clips are stored by their index in CLIPS so the
+    # state can also be written to disk.
+    def get_state(self):
+        return (CLIPS.index(self.clip), self.frame_index, self.time_left, self.playing)
+
+    def set_state(self, state):
+        clip_index, self.frame_index, self.time_left, self.playing = state
+        self.clip = CLIPS[clip_index]
+
+
+def advance_cursors(cursors, dt):
+    # Moves every playing cursor dt seconds forward, at most one frame per call; clips loop.
+    for cursor in cursors:
+        if not cursor.playing:
+            continue
+        cursor.time_left -= dt
+        if cursor.time_left <= 0:
+            clip = cursor.clip
+            frame_index = cursor.frame_index + 1
+            if frame_index == len(clip.frames):
+                frame_index = 0
+            cursor.frame_index = frame_index
+            cursor.time_left += clip.durations[frame_index]
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+# Sound effects and music for Pixel Peak.
+#
+# Gameplay code never calls the mixer itself: play_sound(), play_music() and stop_music()
+# only queue a request, and main.update() calls flush() once per frame, after the
+# simulation, to act on everything queued that frame.
+#
+# - Repeats of an effect within its throttle window (SOUND_EFFECTS) are merged, so a frame
+#   in which thirty enemies get squashed plays one squash, not thirty overlapping ones.
+# - Effects play on a fixed pool of CHANNEL_COUNT reserved mixer channels. When they are
+#   all busy a new effect takes the channel of the oldest sound of lower or equal
+#   priority, or is dropped if everything playing outranks it.
+# - Only the last music request of a frame is carried out, so a stop followed by a play
+#   is one track change, and asking for the track already playing does nothing. Music
+#   files are read into memory ahead of time (add_music()), so a change decodes from
+#   memory instead of opening the file mid-game.
+#
+# Without a working audio device every request is silently dropped.
+import io
+import os
+import time
+
+import pygame
+
+from perf import monitor as perf_monitor
+
+# --- Mixer Settings ---
+CHANNEL_COUNT = 4
+MUSIC_DIRECTORY = 'music'
+MUSIC_EXTENSIONS = ('mp3', 'ogg', 'oga')
+
+PRIORITY_LOW = 0
+PRIORITY_HIGH = 1
+
+# name: (priority, minimum seconds between two plays)
+SOUND_EFFECTS = {
+    'squash_sound': (PRIORITY_LOW, 0.08),
+    'game_over_sound': (PRIORITY_HIGH, 0.5),
+    'win_sound': (PRIORITY_HIGH, 0.5),
+}
+DEFAULT_EFFECT = (PRIORITY_LOW, 0.0)
+
+def find_music_file(name, directory=MUSIC_DIRECTORY):
+    for extension in MUSIC_EXTENSIONS:
+        path = os.path.join(directory, f"{name}.{extension}")
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"no music file for '{name}' in {directory}/")
+
+def read_music_file(name, directory=MUSIC_DIRECTORY):
+    # (bytes, extension); safe to run on a preloader thread.
+    path = find_music_file(name, directory)
+    with open(path, 'rb') as music_file:
+        return music_file.read(), os.path.splitext(path)[1][1:]
+
+
+class AudioMixer:
+    def __init__(self, load_sound, music_volume=1.0, effects=SOUND_EFFECTS, channel_count=CHANNEL_COUNT):
+        # load_sound(name) returns a pygame Sound; it is only used for effects that were
+        # not handed over by add_sound() before their first play.
+        self.load_sound = load_sound
+        self.effects = effects
+        self.channel_count = channel_count
+        self.enabled = True
+        self.music_volume = music_volume
+
+        self.sounds = {}
+        self.music_data = {}
+        self.pending_sounds = []
+        self.music_request = None       # (track name or None,) until flush() handles it
+        self.last_played = {}           # name -> perf_counter() of its last play
+        self.channels = None            # set up on the first flush()
+        self.channel_sounds = []        # (priority, start time) per channel
+        self.wanted_music = None
+        self.current_music = None
+        self.music_stream = None
+
+    def add_sound(self, name, sound):
+        self.sounds[name] = sound
+
+    def add_music(self, name, music_data):
+        self.music_data[name] = music_data
+
+    # --- Requests ---
+    def play_sound(self, name):
+        if self.enabled and name not in self.pending_sounds:
+            self.pending_sounds.append(name)
+
+    def play_music(self, name):
+        self.music_request = (name,)
+
+    def stop_music(self):
+        self.music_request = (None,)
+
+    def set_enabled(self, enabled):
+        # Turning sound off silences everything at once; turning it back on restarts the
+        # track that was last asked for.
+        self.enabled = enabled
+        self.pending_sounds.clear()
+        if not enabled:
+            if self._start_mixer():
+                for channel in self.channels:
+                    channel.stop()
+                pygame.mixer.music.stop()
+            self.current_music = None
+        elif self.music_request is None:
+            self.music_request = (self.wanted_music,)
+
+    # --- Once per frame ---
+    def flush(self):
+        if self.pending_sounds or self.music_request is not None:
+            if self.music_request is not None:
+                self.wanted_music = self.music_request[0]
+            if self._start_mixer():
+                self._flush_sounds()
+                self._flush_music()
+            self.pending_sounds.clear()
+            self.music_request = None
+
+    def _start_mixer(self):
+        if self.channels is None:
+            if not pygame.mixer.get_init():
+                return False
+            if pygame.mixer.get_num_channels() < self.channel_count:
+                pygame.mixer.set_num_channels(self.channel_count)
+            pygame.mixer.set_reserved(self.channel_count)
+            self.channels = [pygame.mixer.Channel(index) for index in range(self.channel_count)]
+            self.channel_sounds = [(PRIORITY_LOW, 0.0)] * self.channel_count
+        return True
+
+    def _flush_sounds(self):
+        now = time.perf_counter()
+        # Most important first, so they get the free channels.
+        pending = sorted(self.pending_sounds, key=lambda name: -self.effects.get(name, DEFAULT_EFFECT)[0])
+        for name in pending:
+            priority, throttle = self.effects.get(name, DEFAULT_EFFECT)
+            if now - self.last_played.get(name, -throttle) < throttle:
+                perf_monitor.count('sounds_throttled')
+                continue
+            index = self._find_channel(priority)
+            if index is None:
+                perf_monitor.count('sounds_dropped')
+                continue
+            sound = self.sounds.get(name)
+            if sound is None:
+                sound = self.sounds[name] = self.load_sound(name)
+            self.channels[index].play(sound)
+            self.channel_sounds[index] = (priority, now)
+            self.last_played[name] = now
+            perf_monitor.count('sounds_played')
+
+    def _find_channel(self, priority):
+        victim = None
+        for index, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                return index
+            playing = self.channel_sounds[index]
+            if playing[0] <= priority and (victim is None or playing < self.channel_sounds[victim]):
+                victim = index
+        return victim
+
+    def _flush_music(self):
+        if self.music_request is None:
+            return
+        name = self.music_request[0]
+        if not self.enabled or name == self.current_music:
+            return
+        if name is None:
+            pygame.mixer.music.stop()
+        else:
+            music_data = self.music_data.get(name)
+            if music_data is None:
+                music_data = self.music_data[name] = read_music_file(name)
+            data, extension = music_data
+            # The mixer reads from the stream for as long as the track plays, so the old
+            # one is only released once load() has let go of it.
+            music_stream = io.BytesIO(data)
+            pygame.mixer.music.load(music_stream, extension)
+            self.music_stream = music_stream
+            pygame.mixer.music.set_volume(self.music_volume)
+            pygame.mixer.music.play(-1)
+        self.current_music = name
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+# Headless frame-time benchmark for Pixel Peak.
+#
+# Generates synthetic levels with a given number of platforms, enemies and trampolines,
+# loads main.py as a Pygame Zero module on SDL's dummy video/audio drivers and runs its
+# real update() and draw() for a fixed number of frames. Update and draw times are
+# reported as p50/p95/p99 and can be written as JSON and compared against an earlier run:
+#
+#   python benchmark.py --platforms 50 400 --enemies 10 200 --json results.json
+#   python benchmark.py --compare results.json
+#
+# With --phases the per-phase times and counters from perf.py are added to each scenario;
+# --dirty-rects draws with main.py's dirty-rectangle renderer.
+import argparse
+import json
+import os
+import platform as host_platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from types import ModuleType
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+from perf import monitor as perf_monitor
+from world import WIDTH, HEIGHT, GROUND_TOP_Y, InputState
+
+GAME_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+GAME_SCRIPT = os.path.join(GAME_DIRECTORY, 'main.py')
+
+DEFAULT_FRAMES = 600
+FRAME_DT = 1 / 60
+PERCENTILES = (50, 95, 99)
+
+# --- Synthetic Levels ---
+def make_synthetic_level(platform_count, enemy_count, trampoline_count, seed=0, width=None):
+    # Level dict in the levels.py JSON layout. Width grows with the platform count so
+    # density stays roughly constant as the level is scaled up.
+    rng = random.Random(seed)
+    width = width or max(WIDTH, platform_count * 160)
+    platforms = [{'type': 'ground', 'rect': [0, GROUND_TOP_Y, width, 50]}]
+    for _ in range(platform_count):
+        tiles = rng.randrange(3, 7)
+        x = rng.randrange(0, max(width - tiles * 64, 1))
+        y = rng.randrange(120, GROUND_TOP_Y - 180)
+        platforms.append({'type': 'floating', 'rect': [x, y, tiles * 64, 50]})
+    for _ in range(trampoline_count):
+        platforms.append({'type': 'trampoline', 'rect': [rng.randrange(200, width - 60), GROUND_TOP_Y - 50, 60, 50]})
+
+    enemies = []
+    for _ in range(enemy_count):
+        if platform_count and rng.random() < 0.5:
+            platform_index = rng.randrange(1, platform_count + 1)
+            x, y, w, _ = platforms[platform_index]['rect']
+            enemies.append({'start_pos': [x + w // 2, y], 'platform': platform_index})
+        else:
+            x = rng.randrange(300, width - 100)
+            enemies.append({'start_pos': [x, GROUND_TOP_Y], 'movement_range': [max(x - 300, 0), min(x + 300, width)]})
+
+    return {
+        'version': 1,
+        'width': width,
+        'height': HEIGHT,
+        'player_start': [100, GROUND_TOP_Y],
+        'platforms': platforms,
+        'enemies': enemies,
+        'flag': [width - 100, GROUND_TOP_Y - 32],
+    }
+
+def scripted_input(frame):
+    # Walks right and jumps every second, so the player crosses the level and keeps
+    # landing on platforms, trampolines and enemies.
+    return InputState(left=False, right=True, jump=frame % 60 < 3)
+
+# --- Game Module ---
+def load_game_module():
+    # Mirrors what pgzero's runner does, minus the main loop: main.py is executed with the
+    # Pygame Zero builtins and a real display surface, so update() and draw() run as-is.
+    sys._pgzrun = True
+    import pgzero.runner
+    import pgzero.screen
+
+    os.chdir(GAME_DIRECTORY)
+    game = ModuleType('main')
+    game.__file__ = GAME_SCRIPT
+    sys.modules['main'] = game
+    pgzero.runner.prepare_mod(game)
+    surface = pygame.display.set_mode((WIDTH, HEIGHT))
+    game.screen = pgzero.screen.Screen(surface)
+    sys.modules['pgzero.game'].screen = surface
+
+    with open(GAME_SCRIPT, encoding='utf-8') as script:
+        code = compile(script.read(), GAME_SCRIPT, 'exec')
+    exec(code, game.__dict__)
+    game.is_sound_on = False
+    game.sound_mixer.set_enabled(False)
+    return game
+
+# --- Measurement ---
+def percentile(samples, percent):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize(samples):
+    summary = {f'p{percent}': percentile(samples, percent) * 1000 for percent in PERCENTILES}
+    summary['mean'] = statistics.fmean(samples) * 1000
+    summary['max'] = max(samples) * 1000
+    return summary
+
+def run_scenario(game, level_path, frames, phases=False):
+    if phases:
+        perf_monitor.enable()
+        perf_monitor.clear()
+    game.LEVEL_FILE = level_path
+    game.current_game_state = game.GAME_STATE_IN_GAME
+    game.initialize_game_elements()
+
+    update_times = []
+    draw_times = []
+    restarts = 0
+    frame_number = 0
+    game.read_input = lambda: scripted_input(frame_number)
+    for frame_number in range(frames):
+        start = time.perf_counter()
+        game.update(FRAME_DT)
+        updated = time.perf_counter()
+        game.draw()
+        drawn = time.perf_counter()
+        update_times.append(updated - start)
+        draw_times.append(drawn - updated)
+
+        # Losing or winning ends the level; restart it outside the timed region so
+        # every scenario measures the same number of gameplay frames.
+        if game.current_game_state != game.GAME_STATE_IN_GAME:
+            restarts += 1
+            game.current_game_state = game.GAME_STATE_IN_GAME
+            game.initialize_game_elements()
+
+    total_times = [u + d for u, d in zip(update_times, draw_times)]
+    results = {
+        'update_ms': summarize(update_times),
+        'draw_ms': summarize(draw_times),
+        'frame_ms': summarize(total_times),
+        'restarts': restarts,
+    }
+    if phases:
+        perf_summary = perf_monitor.summary()
+        results['phases_ms'] = perf_summary['phases_ms']
+        results['counters'] = perf_summary['counters']
+        perf_monitor.disable()
+    return results
+
+def run_benchmarks(platform_counts, enemy_counts, trampoline_counts, frames, seed, phases=False, dirty_rects=False):
+    game = load_game_module()
+    game.DIRTY_RECT_RENDERING = dirty_rects
+    results = []
+    with tempfile.TemporaryDirectory() as level_directory:
+        for platform_count in platform_counts:
+            for enemy_count in enemy_counts:
+                for trampoline_count in trampoline_counts:
+                    level = make_synthetic_level(platform_count, enemy_count, trampoline_count, seed)
+                    level_path = os.path.join(level_directory, f'bench_{platform_count}_{enemy_count}_{trampoline_count}.json')
+                    with open(level_path, 'w', encoding='utf-8') as level_file:
+                        json.dump(level, level_file)
+
+                    scenario = {'platforms': platform_count, 'enemies': enemy_count,
+                                'trampolines': trampoline_count, 'frames': frames, 'seed': seed}
+                    scenario.update(run_scenario(game, level_path, frames, phases))
+                    results.append(scenario)
+                    print_scenario(scenario)
+    return {
+        'python': sys.version.split()[0],
+        'pygame': pygame.version.ver,
+        'machine': host_platform.platform(),
+        'scenarios': results,
+    }
+
+# --- Reporting ---
+def scenario_key(scenario):
+    return (scenario['platforms'], scenario['enemies'], scenario['trampolines'])
+
+def print_scenario(scenario):
+    update = scenario['update_ms']
+    draw = scenario['draw_ms']
+    print(f"platforms={scenario['platforms']:<5} enemies={scenario['enemies']:<5} trampolines={scenario['trampolines']:<4} "
+          f"update p50/p95/p99 {update['p50']:6.2f} {update['p95']:6.2f} {update['p99']:6.2f} ms | "
+          f"draw p50/p95/p99 {draw['p50']:6.2f} {draw['p95']:6.2f} {draw['p99']:6.2f} ms")
+
+def print_comparison(baseline, current):
+    baseline_scenarios = {scenario_key(scenario): scenario for scenario in baseline['scenarios']}
+    for scenario in current['scenarios']:
+        previous = baseline_scenarios.get(scenario_key(scenario))
+        if previous is None:
+            continue
+        changes = []
+        for phase in ('update_ms', 'draw_ms'):
+            for percent in PERCENTILES:
+                before = previous[phase][f'p{percent}']
+                after = scenario[phase][f'p{percent}']
+                change = (after - before) / before * 100 if before else 0.0
+                changes.append(f"{phase[:-3]} p{percent} {change:+6.1f}%")
+        print(f"{scenario_key(scenario)}: " + ", ".join(changes))
+
+def main():
+    parser = argparse.ArgumentParser(description="Pixel Peak headless frame-time benchmark")
+    parser.add_argument('--platforms', type=int, nargs='+', default=[20, 200])
+    parser.add_argument('--enemies', type=int, nargs='+', default=[3, 100])
+    parser.add_argument('--trampolines', type=int, nargs='+', default=[5])
+    parser.add_argument('--frames', type=int, default=DEFAULT_FRAMES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--phases', action='store_true', help="record per-phase times and counters")
+    parser.add_argument('--dirty-rects', action='store_true', help="draw with the dirty-rectangle renderer")
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--compare', help="print changes against an earlier --json result")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.platforms, args.enemies, args.trampolines, args.frames, args.seed, args.phases, args.dirty_rects)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as results_file:
+            json.dump(results, results_file, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as baseline_file:
+            print_comparison(json.load(baseline_file), results)
+
+if __name__ == '__main__':
+    main()
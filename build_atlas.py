@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# Packs every sprite in images/ into one texture atlas.
+#
+#   python build_atlas.py
+#
+# writes images/atlas.png and images/atlas.json, a manifest mapping each sprite name (the
+# PNG's file name without extension) to its [x, y, width, height] in the atlas. At runtime
+# get_image_asset() in main.py hands out subsurfaces of the atlas, so every sprite comes
+# from one file read and one decoded surface. Sprites missing from the manifest are still
+# loaded from their own PNG, so the atlas only has to be rebuilt when art changes.
+import argparse
+import json
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+IMAGES_DIRECTORY = 'images'
+ATLAS_IMAGE_NAME = 'atlas'
+ATLAS_MAX_WIDTH = 1024
+# Transparent gap around each sprite so scaled or filtered blits never pick up a neighbour.
+ATLAS_PADDING = 1
+
+def collect_sprites(images_directory):
+    sprites = {}
+    for file_name in sorted(os.listdir(images_directory)):
+        name, extension = os.path.splitext(file_name)
+        if extension.lower() != '.png' or name == ATLAS_IMAGE_NAME:
+            continue
+        sprites[name] = pygame.image.load(os.path.join(images_directory, file_name))
+    return sprites
+
+def pack_sprites(sizes, max_width=ATLAS_MAX_WIDTH, padding=ATLAS_PADDING):
+    # Shelf packing: tallest sprites first, filled left to right into rows. Returns
+    # {name: (x, y, width, height)} and the atlas size.
+    placements = {}
+    shelf_x = shelf_y = shelf_height = 0
+    atlas_width = 0
+    for name, (width, height) in sorted(sizes.items(), key=lambda item: (-item[1][1], -item[1][0], item[0])):
+        if shelf_x + width + padding > max_width and shelf_x > 0:
+            shelf_y += shelf_height
+            shelf_x = shelf_height = 0
+        placements[name] = (shelf_x + padding, shelf_y + padding, width, height)
+        shelf_x += width + padding
+        shelf_height = max(shelf_height, height + padding)
+        atlas_width = max(atlas_width, shelf_x + padding)
+    return placements, (atlas_width, shelf_y + shelf_height + padding)
+
+def build_atlas(images_directory=IMAGES_DIRECTORY, max_width=ATLAS_MAX_WIDTH):
+    sprites = collect_sprites(images_directory)
+    placements, atlas_size = pack_sprites({name: image.get_size() for name, image in sprites.items()}, max_width)
+
+    atlas = pygame.Surface(atlas_size, pygame.SRCALPHA)
+    atlas.fill((0, 0, 0, 0))
+    for name, (x, y, _, _) in placements.items():
+        atlas.blit(sprites[name], (x, y))
+
+    pygame.image.save(atlas, os.path.join(images_directory, f'{ATLAS_IMAGE_NAME}.png'))
+    manifest = {
+        'image': f'{ATLAS_IMAGE_NAME}.png',
+        'size': list(atlas_size),
+        'sprites': {name: list(placements[name]) for name in sorted(placements)},
+    }
+    with open(os.path.join(images_directory, f'{ATLAS_IMAGE_NAME}.json'), 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack images/*.png into a texture atlas")
+    parser.add_argument('--images', default=IMAGES_DIRECTORY)
+    parser.add_argument('--max-width', type=int, default=ATLAS_MAX_WIDTH)
+    args = parser.parse_args()
+
+    manifest = build_atlas(args.images, args.max_width)
+    print(f"{len(manifest['sprites'])} sprites packed into {manifest['size'][0]}x{manifest['size'][1]}")
+
+if __name__ == '__main__':
+    main()
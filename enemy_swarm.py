@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+# Struct-of-arrays enemy store for levels with hundreds of walkers.
+#
+# EnemySwarm keeps every enemy's position, velocity, patrol bounds, animation and squash
+# state in NumPy arrays and runs the same rules as EnemyBody.update for the whole swarm
+# in one call. World uses it in place of the EnemyBody list when batched enemies are on.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from animation import ENEMY_WALK_RIGHT
+from perf import monitor
+from world import BROADPHASE_CELL_SIZE, ENEMY_SIZE, EVENT_ENEMY_SQUASHED, OUTCOME_PLAYING
+
+ENEMY_FALL_SPEED = 150
+PLATFORM_SNAP_TOLERANCE = 5
+
+def numpy_available():
+    return np is not None
+
+
+class SwarmEnemy:
+    # Lightweight view of one swarm slot, handed to the player's collision code by
+    # EnemySwarm.query() so it can treat swarm enemies exactly like EnemyBody objects.
+    __slots__ = ('swarm', 'index')
+
+    def __init__(self, swarm, index):
+        self.swarm = swarm
+        self.index = index
+
+    width = property(lambda self: self.swarm.width)
+    height = property(lambda self: self.swarm.height)
+    left = property(lambda self: float(self.swarm.x[self.index]))
+    top = property(lambda self: float(self.swarm.y[self.index]))
+    right = property(lambda self: float(self.swarm.x[self.index]) + self.swarm.width)
+    bottom = property(lambda self: float(self.swarm.y[self.index]) + self.swarm.height)
+    is_squashed = property(lambda self: bool(self.swarm.is_squashed[self.index]))
+
+    def squash(self, world):
+        self.swarm.squash(world, self.index)
+
+
+class EnemySwarm:
+    # Per-enemy arrays and their dtypes (float64 unless listed). Every operation that
+    # resizes or filters the swarm goes through this table.
+    FIELDS = ('x', 'y', 'vx', 'speed', 'movement_start', 'movement_end', 'has_platform',
+              'platform_left', 'platform_right', 'animation_time_left',
+              'current_frame_index', 'is_squashed', 'squashed_timer', 'squash_duration', 'spawn_id')
+    FIELD_DTYPES = {'has_platform': bool, 'current_frame_index': np.int8 if np else None,
+                    'is_squashed': bool, 'spawn_id': np.int64 if np else None}
+
+    def __init__(self, platforms):
+        if np is None:
+            raise ImportError("EnemySwarm requires numpy")
+
+        self.width, self.height = ENEMY_SIZE
+        self.count = 0
+        for name in self.FIELDS:
+            setattr(self, name, np.zeros(0, dtype=self.FIELD_DTYPES.get(name, float)))
+        self.previous_x = None
+        self.previous_y = None
+        # Walk cycle timing from the animation table; the left and right clips share it,
+        # so current_frame_index indexes either of them.
+        self.walk_frame_durations = np.array(ENEMY_WALK_RIGHT.durations, dtype=float)
+        self.set_platforms(platforms)
+
+    def set_platforms(self, platforms):
+        # Platform edges as flat arrays, in level order, plus a column table for the
+        # broadphase: row c lists the indices of the platforms reaching into the
+        # BROADPHASE_CELL_SIZE wide column c (padded with -1), and the last row is empty
+        # for enemies outside every column.
+        rects = [platform_data.rect for platform_data in platforms]
+        self.platforms_left = np.array([rect.left for rect in rects], dtype=float)
+        self.platforms_right = np.array([rect.right for rect in rects], dtype=float)
+        self.platforms_top = np.array([rect.top for rect in rects], dtype=float)
+        self.platforms_bottom = np.array([rect.bottom for rect in rects], dtype=float)
+
+        columns = {}
+        for index, rect in enumerate(rects):
+            for column in range(int(rect.left // BROADPHASE_CELL_SIZE), int(rect.right // BROADPHASE_CELL_SIZE) + 1):
+                columns.setdefault(column, []).append(index)
+        self.first_column = min(columns, default=0)
+        column_count = max(columns, default=-1) - self.first_column + 1
+        depth = max((len(indices) for indices in columns.values()), default=0)
+        self.column_platforms = np.full((column_count + 1, depth), -1, dtype=np.int64)
+        for column, indices in columns.items():
+            self.column_platforms[column - self.first_column, :len(indices)] = indices
+
+    @classmethod
+    def from_bodies(cls, enemies, platforms):
+        swarm = cls(platforms)
+        swarm.add_many(enemies)
+        return swarm
+
+    def add_many(self, enemies):
+        if not enemies:
+            return
+        columns = {
+            'x': [enemy.left for enemy in enemies],
+            'y': [enemy.top for enemy in enemies],
+            'vx': [enemy.vx for enemy in enemies],
+            'speed': [enemy.speed for enemy in enemies],
+            'movement_start': [enemy.movement_start for enemy in enemies],
+            'movement_end': [enemy.movement_end for enemy in enemies],
+            'has_platform': [bool(enemy.platform_rect) for enemy in enemies],
+            'platform_left': [enemy.platform_rect.left if enemy.platform_rect else 0 for enemy in enemies],
+            'platform_right': [enemy.platform_rect.right if enemy.platform_rect else 0 for enemy in enemies],
+            'animation_time_left': [enemy.animation.time_left for enemy in enemies],
+            'current_frame_index': [enemy.animation.frame_index for enemy in enemies],
+            'is_squashed': [enemy.is_squashed for enemy in enemies],
+            'squashed_timer': [enemy.squashed_timer for enemy in enemies],
+            'squash_duration': [enemy.SQUASH_DURATION for enemy in enemies],
+            'spawn_id': [-1 if enemy.spawn_id is None else enemy.spawn_id for enemy in enemies],
+        }
+        for name in self.FIELDS:
+            added = np.array(columns[name], dtype=self.FIELD_DTYPES.get(name, float))
+            setattr(self, name, np.concatenate((getattr(self, name), added)))
+        self.count += len(enemies)
+        self.previous_x = None
+        self.previous_y = None
+
+    def unload(self, left, right):
+        centre = self.x + self.width / 2
+        leaving = (centre >= left) & (centre < right)
+        unloaded = [int(spawn_id) for spawn_id in self.spawn_id[leaving] if spawn_id >= 0]
+        if leaving.any():
+            self.compact(~leaving)
+        return unloaded
+
+    def __len__(self):
+        return self.count
+
+    def get_state(self):
+        # Copies of every column, in FIELDS order, for World.snapshot().
+        return tuple(getattr(self, name).copy() for name in self.FIELDS)
+
+    def set_state(self, state):
+        for name, column in zip(self.FIELDS, state):
+            setattr(self, name, column.copy())
+        self.count = len(self.x)
+        self.previous_x = None
+        self.previous_y = None
+
+    def state_from_lists(self, columns):
+        # get_state() output rebuilt from its to-JSON form (one list per column).
+        return tuple(np.array(column, dtype=self.FIELD_DTYPES.get(name, float))
+                     for name, column in zip(self.FIELDS, columns))
+
+    def _platform_candidates(self, rows):
+        # (len(rows), n) matrix of platform indices sharing a column with each enemy in
+        # rows, -1 where there are none. An enemy is narrower than a column, so it spans
+        # at most two; the second is only looked at when it differs from the first.
+        empty_row = len(self.column_platforms) - 1
+        first = (self.x[rows] // BROADPHASE_CELL_SIZE).astype(np.int64) - self.first_column
+        last = ((self.x[rows] + self.width) // BROADPHASE_CELL_SIZE).astype(np.int64) - self.first_column
+        first = np.where((first >= 0) & (first < empty_row), first, empty_row)
+        last = np.where((last >= 0) & (last < empty_row) & (last != first), last, empty_row)
+        candidates = np.concatenate((self.column_platforms[first], self.column_platforms[last]), axis=1)
+        monitor.count('colliderect', int((candidates >= 0).sum()))
+        return candidates
+
+    def store_previous(self):
+        self.previous_x = self.x + self.width / 2
+        self.previous_y = self.y + self.height / 2
+
+    def squash(self, world, index):
+        self.is_squashed[index] = True
+        self.squashed_timer[index] = self.squash_duration[index]
+        self.current_frame_index[index] = 0
+        world.events.append(EVENT_ENEMY_SQUASHED)
+
+    def query(self, bounds):
+        # Same contract as SpatialHash.query(): candidates overlapping bounds, in order.
+        hits = np.flatnonzero(
+            (self.x < bounds.right) & (bounds.left < self.x + self.width) &
+            (self.y < bounds.bottom) & (bounds.top < self.y + self.height)
+        )
+        return [SwarmEnemy(self, int(index)) for index in hits]
+
+    def update(self, world, dt, region=None):
+        if world.outcome != OUTCOME_PLAYING or self.count == 0:
+            return
+
+        if region is None:
+            active = np.ones(self.count, dtype=bool)
+        else:
+            active = ((self.x < region.right) & (region.left < self.x + self.width) &
+                      (self.y < region.bottom) & (region.top < self.y + self.height))
+
+        squashed = self.is_squashed
+        self.squashed_timer[squashed & active] -= dt
+        expired = squashed & active & (self.squashed_timer <= 0)
+
+        walking = ~squashed & active
+        self.animation_time_left[walking] -= dt
+        # Positions advance through the centre, as Body.x does, so the batched and
+        # per-object paths round identically at platform edges.
+        half_width = self.width / 2
+        half_height = self.height / 2
+        self.x[walking] = (self.x[walking] + half_width + self.vx[walking] * dt) - half_width
+
+        # Patrol reversal: platform-bound enemies clamp to their platform edges, free
+        # walkers bounce between movement_start and movement_end.
+        x, vx = self.x, self.vx
+        bound = walking & self.has_platform
+        hit_left = bound & (vx < 0) & (x <= self.platform_left)
+        hit_right = bound & ~hit_left & (vx > 0) & (x + self.width >= self.platform_right)
+        x[hit_left] = self.platform_left[hit_left]
+        vx[hit_left] = self.speed[hit_left]
+        x[hit_right] = self.platform_right[hit_right] - self.width
+        vx[hit_right] = -self.speed[hit_right]
+
+        free = walking & ~self.has_platform
+        turn = free & (((vx < 0) & (x <= self.movement_start)) |
+                       ((vx > 0) & (x + self.width >= self.movement_end)))
+        vx[turn] *= -1
+
+        advance = walking & (self.animation_time_left <= 0)
+        next_frame = (self.current_frame_index[advance] + 1) % len(self.walk_frame_durations)
+        self.current_frame_index[advance] = next_frame
+        self.animation_time_left[advance] += self.walk_frame_durations[next_frame]
+
+        # Ground snap against the platforms in each walker's columns; the lowest platform
+        # index among the supports is the first one EnemyBody.update's grid query meets.
+        fall = ENEMY_FALL_SPEED * dt
+        rows = np.flatnonzero(walking)
+        on_ground = np.zeros(self.count, dtype=bool)
+        candidates = self._platform_candidates(rows)
+        if candidates.size:
+            valid = candidates >= 0
+            left, right = self.platforms_left[candidates], self.platforms_right[candidates]
+            top, bottom_edge = self.platforms_top[candidates], self.platforms_bottom[candidates]
+            x_rows = x[rows][:, None]
+            y_rows = self.y[rows][:, None]
+            bottom = y_rows + self.height
+            supports = (
+                valid &
+                (x_rows < right) & (left < x_rows + self.width) &
+                (y_rows < bottom_edge) & (top < bottom) &
+                (bottom <= top + PLATFORM_SNAP_TOLERANCE) & (bottom >= top - PLATFORM_SNAP_TOLERANCE)
+            )
+            lands = supports.any(axis=1)
+            first_support = np.where(supports, candidates, len(self.platforms_top)).min(axis=1)
+            on_ground[rows[lands]] = True
+            self.y[rows[lands]] = self.platforms_top[first_support[lands]] - self.height
+
+            # Swept landing, as in EnemyBody.update: feet that would pass a platform's snap
+            # band this step stop on the highest platform top they cross. Falling doesn't
+            # change x, so the walkers' candidates still apply.
+            falling = ~lands
+            band = top[falling] + PLATFORM_SNAP_TOLERANCE
+            bottom = bottom[falling]
+            crossed = (
+                valid[falling] &
+                (x_rows[falling] < right[falling]) & (left[falling] < x_rows[falling] + self.width) &
+                (bottom <= band) & (band < bottom + fall)
+            )
+            landing = crossed.any(axis=1)
+            landing_top = np.where(crossed, top[falling], np.inf).min(axis=1)
+            landed_rows = rows[falling][landing]
+            self.y[landed_rows] = landing_top[landing] - self.height
+            on_ground[landed_rows] = True
+
+        airborne = walking & ~on_ground
+        self.y[airborne] = (self.y[airborne] + half_height + fall) - half_height
+        fell = airborne & (self.y > world.height)
+        self.is_squashed[fell] = True
+        self.squashed_timer[fell] = 0
+        self.current_frame_index[fell] = 0
+
+        if expired.any():
+            world.defeated_enemy_ids.update(int(spawn_id) for spawn_id in self.spawn_id[expired] if spawn_id >= 0)
+            self.compact(~expired)
+
+    def compact(self, keep):
+        for name in self.FIELDS:
+            setattr(self, name, getattr(self, name)[keep])
+        if self.previous_x is not None:
+            self.previous_x = self.previous_x[keep]
+            self.previous_y = self.previous_y[keep]
+        self.count = int(keep.sum())
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+# Main loop for Pixel Peak.
+#
+# Same loop as pgzero's PGZeroGame (events, clock, update(), draw()), with optional hooks
+# the game module may define:
+#
+#   get_dirty_rects()  - only the rectangles returned are pushed with
+#                        pygame.display.update(); None asks for a full flip and an empty
+#                        list presents nothing.
+#   get_frame_rate()   - frame rate cap for the current frame (FRAME_RATE otherwise).
+#   is_frame_static()  - True when redrawing would produce the same picture. Static
+#                        frames are not drawn, and while capped below FRAME_RATE the loop
+#                        sleeps in pygame.event.wait() so input still wakes it at once.
+#
+# The game always draws at WIDTH x HEIGHT. When the module asks for a bigger window
+# (WINDOW_SCALE > 1) or FULLSCREEN, draw() targets an offscreen surface of that size and
+# present() puts it on the display with a single nearest-neighbour upscale: by the largest
+# whole factor that fits, centred, or stretched to fit when INTEGER_SCALING is off. Fill
+# and blit costs stay those of the internal resolution however large the display is, and
+# mouse positions are mapped back to it before the handlers see them.
+#
+# Started with go() in place of pgzrun.go(); when the game is launched through the pgzrun
+# command instead, pgzero's own loop runs every frame at full rate, which is always correct.
+import sys
+
+import pygame
+import pgzero.clock
+import pgzero.game
+import pgzero.screen
+from pgzero.game import DEFAULTICON, PGZeroGame
+
+FRAME_RATE = 60
+
+# Events that can change what a static screen shows, so they always trigger a redraw;
+# after an expose the window contents are lost and the whole frame is presented again.
+INPUT_EVENTS = (pygame.KEYDOWN, pygame.KEYUP, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP)
+EXPOSE_EVENTS = (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE)
+MOUSE_EVENTS = (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEMOTION)
+LETTERBOX_COLOR = (0, 0, 0)
+
+def fit_render_target(size, display_size, integer_scaling=True):
+    # Where a picture of `size` goes on the display: as large as fits with its aspect
+    # ratio kept, by a whole factor when integer_scaling is on and the display allows it.
+    width, height = size
+    scale = min(display_size[0] / width, display_size[1] / height)
+    if integer_scaling and scale >= 1:
+        scale = int(scale)
+    scaled_rect = pygame.Rect(0, 0, int(width * scale), int(height * scale))
+    scaled_rect.center = (display_size[0] // 2, display_size[1] // 2)
+    return scaled_rect
+
+
+class PixelPeakGame(PGZeroGame):
+    def __init__(self, mod):
+        super().__init__(mod)
+        self.display_mode = None
+        self.display = None
+        # Offscreen surface draw() renders into, and the display area it is scaled onto;
+        # both None when the game draws straight to a display of its own size.
+        self.render_target = None
+        self.scaled_rect = None
+        self.scaled_view = None
+
+    def reinit_screen(self):
+        # Same as PGZeroGame.reinit_screen(), plus FULLSCREEN/WINDOW_SCALE handling.
+        # Returns True when the display was (re)created.
+        mod = self.mod
+        icon = getattr(mod, 'ICON', DEFAULTICON)
+        if icon and icon != self.icon:
+            if icon is DEFAULTICON:
+                self.show_default_icon()
+            else:
+                pygame.display.set_icon(pygame.image.load(icon))
+            self.icon = icon
+
+        display_mode = (getattr(mod, 'WIDTH', 800), getattr(mod, 'HEIGHT', 600), getattr(mod, 'FULLSCREEN', False),
+                        getattr(mod, 'WINDOW_SCALE', 1), getattr(mod, 'INTEGER_SCALING', True))
+        changed = display_mode != self.display_mode
+        if changed:
+            self.set_display_mode(*display_mode)
+
+        title = getattr(mod, 'TITLE', 'Pygame Zero Game')
+        if title != self.title:
+            pygame.display.set_caption(title)
+            self.title = title
+        return changed
+
+    def set_display_mode(self, width, height, fullscreen, window_scale, integer_scaling):
+        if fullscreen:
+            self.display = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+        else:
+            self.display = pygame.display.set_mode((width * window_scale, height * window_scale))
+
+        if self.display.get_size() == (width, height):
+            self.render_target = self.scaled_rect = self.scaled_view = None
+            surface = self.display
+        else:
+            self.render_target = pygame.Surface((width, height)).convert()
+            self.scaled_rect = fit_render_target((width, height), self.display.get_size(), integer_scaling)
+            self.scaled_view = self.display.subsurface(self.scaled_rect)
+            surface = self.render_target
+
+        if hasattr(self.mod, 'screen'):
+            self.mod.screen.surface = surface
+        else:
+            self.mod.screen = pgzero.screen.Screen(surface)
+        self.screen = pgzero.game.screen = surface
+        self.width, self.height = width, height
+        self.display_mode = (width, height, fullscreen, window_scale, integer_scaling)
+
+    def to_render_coordinates(self, event):
+        # Mouse events carry display positions; handlers expect internal ones.
+        if self.scaled_rect is None or event.type not in MOUSE_EVENTS:
+            return event
+        x, y = event.pos
+        width, height = self.render_target.get_size()
+        pos = (int((x - self.scaled_rect.x) * width / self.scaled_rect.width),
+               int((y - self.scaled_rect.y) * height / self.scaled_rect.height))
+        return pygame.event.Event(event.type, dict(event.dict, pos=pos))
+
+    def present(self, full_frame):
+        get_dirty_rects = getattr(self.mod, 'get_dirty_rects', None)
+        dirty_rects = get_dirty_rects() if get_dirty_rects and not full_frame else None
+        if self.render_target is None:
+            if dirty_rects is None:
+                pygame.display.flip()
+            elif dirty_rects:
+                pygame.display.update(dirty_rects)
+            return
+
+        # Dirty rectangles map onto whole display pixels only at an integer scale.
+        scale = self.scaled_rect.width // self.render_target.get_width()
+        if dirty_rects is not None and self.scaled_rect.width != self.render_target.get_width() * scale:
+            dirty_rects = None
+        if dirty_rects is None:
+            if full_frame:
+                self.display.fill(LETTERBOX_COLOR)
+            pygame.transform.scale(self.render_target, self.scaled_rect.size, self.scaled_view)
+            pygame.display.flip()
+        elif dirty_rects:
+            target_rect = self.render_target.get_rect()
+            updated = []
+            for rect in dirty_rects:
+                rect = pygame.Rect(rect).clip(target_rect)
+                if not rect.width or not rect.height:
+                    continue
+                scaled = pygame.Rect(rect.x * scale, rect.y * scale, rect.width * scale, rect.height * scale)
+                pygame.transform.scale(self.render_target.subsurface(rect), scaled.size, self.scaled_view.subsurface(scaled))
+                updated.append(scaled.move(self.scaled_rect.topleft))
+            pygame.display.update(updated)
+
+    def wait_for_frame(self, clock, frame_rate, idle):
+        # Returns the frame's dt and its events. Idle frames block on the event queue for
+        # up to one frame period instead of spinning through clock.tick().
+        if idle and frame_rate < FRAME_RATE:
+            event = pygame.event.wait(int(1000 / frame_rate))
+            events = [] if event.type == pygame.NOEVENT else [event]
+            events.extend(pygame.event.get())
+            return clock.tick() / 1000.0, events
+        return clock.tick(frame_rate) / 1000.0, pygame.event.get()
+
+    def mainloop(self):
+        clock = pygame.time.Clock()
+        self.reinit_screen()
+
+        update = self.get_update_func()
+        draw = self.get_draw_func()
+        self.load_handlers()
+
+        pgzclock = pgzero.clock.clock
+        get_frame_rate = getattr(self.mod, 'get_frame_rate', lambda: FRAME_RATE)
+        is_frame_static = getattr(self.mod, 'is_frame_static', lambda: False)
+
+        self.need_redraw = True
+        idle = False
+        while True:
+            dt, events = self.wait_for_frame(clock, get_frame_rate(), idle)
+
+            exposed = False
+            for event in events:
+                event = self.to_render_coordinates(event)
+                if event.type in INPUT_EVENTS:
+                    self.need_redraw = True
+                elif event.type in EXPOSE_EVENTS:
+                    self.need_redraw = exposed = True
+                if event.type == pygame.QUIT:
+                    return
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_q and event.mod & (pygame.KMOD_CTRL | pygame.KMOD_META):
+                        sys.exit(0)
+                    self.keyboard._press(event.key)
+                elif event.type == pygame.KEYUP:
+                    self.keyboard._release(event.key)
+                self.dispatch_event(event)
+
+            pgzclock.tick(dt)
+
+            if update:
+                update(dt)
+
+            screen_changed = self.reinit_screen()
+            idle = is_frame_static()
+            if screen_changed or pgzclock.fired or self.need_redraw or (update and not idle):
+                draw()
+                self.present(screen_changed or exposed)
+                self.need_redraw = False
+
+
+def go():
+    if getattr(sys, '_pgzrun', None):
+        return
+    PixelPeakGame(sys.modules['__main__']).run()
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+# Procedural levels for Pixel Peak.
+#
+# generate_level(seed) lays out a level left to right as a chain of surfaces - ground
+# segments with pits between them, floating platforms of platform_left/middle/right tiles
+# and trampolines - then adds patrolling enemies and puts the flag on the last surface.
+# Every gap and height difference in the chain is kept within REACH_MARGIN of what a jump
+# with PlayerBody's own speed, jump power and gravity (or a trampoline bounce) can cover,
+# and the same seed always gives the same level. The result is a dict in the levels.py
+# JSON layout, so load_level() and "python levels.py pack" take it as any other level.
+#
+# Generated levels are cached on disk under CACHE_DIRECTORY, one file per (seed,
+# GENERATOR_VERSION), so playing a seed again only reads a file. Bump GENERATOR_VERSION
+# whenever a change here would lay out a seed differently. Batches are spread over a
+# process pool, and --verify checks the result with validate_level() and reachability.py:
+#
+#   python level_generator.py 0 --count 5000 --workers 8
+#   python level_generator.py 42 --verify
+import argparse
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from world import HEIGHT, GROUND_TOP_Y, TRAMPOLINE_JUMP_BOOST, PlayerBody
+
+GENERATOR_VERSION = 2
+CACHE_DIRECTORY = 'levels/generated'
+
+# --- Layout Settings ---
+SECTION_COUNT = 24              # surfaces after the starting ground
+TILE_WIDTH = 64                 # floating platforms are whole platform_* tiles wide
+PLATFORM_HEIGHT = 50
+PLATFORM_TILES = (3, 6)
+GROUND_TILES = (4, 10)
+START_GROUND_TILES = (8, 12)
+TRAMPOLINE_SIZE = (60, 50)
+MIN_PLATFORM_TOP = 160          # leaves the 128 pixel tall player room to stand and jump
+MAX_PLATFORM_TOP = GROUND_TOP_Y - 80
+MIN_GAP = 64
+MAX_GAP = 320
+FLAG_OFFSET = 30                # flag centre above the top of the surface it stands on
+LEVEL_END_MARGIN = 200
+
+GROUND_CHANCE = 0.3
+TRAMPOLINE_CHANCE = 0.35        # per ground segment wide enough to hold one
+ENEMY_CHANCE = 0.4              # per surface wide enough to patrol
+MIN_PATROL_WIDTH = 4 * TILE_WIDTH
+
+# Share of the ideal jump that gaps and climbs are held to, leaving room for late
+# take-offs and the fixed timestep.
+REACH_MARGIN = 0.75
+
+# --- Jump Physics ---
+_player = PlayerBody((0, 0))
+RUN_SPEED = _player.speed
+GRAVITY = _player.gravity
+JUMP_SPEED = -_player.jump_power
+BOUNCE_SPEED = -TRAMPOLINE_JUMP_BOOST
+
+def max_rise(launch_speed):
+    return launch_speed * launch_speed / (2 * GRAVITY) * REACH_MARGIN
+
+def flight_distance(rise, launch_speed):
+    # Horizontal distance covered at full run speed between leaving the ground at
+    # launch_speed and coming back down to `rise` pixels above the take-off height.
+    discriminant = launch_speed * launch_speed - 2 * GRAVITY * rise
+    if discriminant < 0:
+        return 0
+    return RUN_SPEED * (launch_speed + math.sqrt(discriminant)) / GRAVITY
+
+def jump_reach(rise, launch_speed):
+    return flight_distance(rise, launch_speed) * REACH_MARGIN
+
+def climb_distance(rise, launch_speed):
+    # Horizontal distance covered at full run speed while climbing `rise` pixels. A higher
+    # surface at least this far ahead is passed over rather than hit from below, even
+    # when the player holds towards it from take-off (as off a trampoline).
+    if rise <= 0:
+        return 0
+    discriminant = max(launch_speed * launch_speed - 2 * GRAVITY * rise, 0)
+    return RUN_SPEED * (launch_speed - math.sqrt(discriminant)) / GRAVITY
+
+
+# --- Generation ---
+def enemy_span(enemy, platforms):
+    # Left and right limits of where an enemy walks, read the way levels.py reads them.
+    start_x = enemy['start_pos'][0]
+    if 'movement_range' in enemy:
+        left, right = enemy['movement_range']
+    else:
+        left, _, width, _ = platforms[enemy['platform']]['rect']
+        right = left + width
+    return min(left, start_x), max(right, start_x)
+
+def _overlaps(span, rect):
+    return span[0] < rect[0] + rect[2] and rect[0] < span[1]
+
+def _place_after(rng, takeoff_right, takeoff_top, launch_speed, top):
+    # Left edge for a surface with the given top, a jumpable gap after takeoff_right.
+    rise = takeoff_top - top
+    shortest = max(MIN_GAP, int(climb_distance(rise, launch_speed)))
+    longest = int(min(jump_reach(rise, launch_speed), MAX_GAP))
+    return takeoff_right + rng.randint(shortest, max(shortest, longest))
+
+def generate_level(seed):
+    rng = random.Random(seed)
+    platforms = []
+    enemies = []
+
+    def add_platform(platform_type, rect):
+        platforms.append({'type': platform_type, 'rect': list(rect)})
+        return len(platforms) - 1
+
+    def add_ground(left, width, is_start=False):
+        index = add_platform('ground', (left, GROUND_TOP_Y, width, PLATFORM_HEIGHT))
+        right = left + width
+        takeoff = (right, GROUND_TOP_Y, JUMP_SPEED)
+        if not is_start and width >= MIN_PATROL_WIDTH and rng.random() < ENEMY_CHANCE:
+            # Kept clear of the right end, where a trampoline may go.
+            enemies.append({'start_pos': [left + TILE_WIDTH, GROUND_TOP_Y],
+                            'movement_range': [left, right - 2 * TILE_WIDTH]})
+        if width >= 3 * TILE_WIDTH and rng.random() < TRAMPOLINE_CHANCE:
+            trampoline_left = right - TRAMPOLINE_SIZE[0] - rng.randint(0, TILE_WIDTH // 2)
+            trampoline_top = GROUND_TOP_Y - TRAMPOLINE_SIZE[1]
+            add_platform('trampoline', (trampoline_left, trampoline_top) + TRAMPOLINE_SIZE)
+            takeoff = (trampoline_left + TRAMPOLINE_SIZE[0] // 2, trampoline_top, BOUNCE_SPEED)
+        return index, takeoff
+
+    def add_floating(left, top, width=None):
+        width = width or rng.randint(*PLATFORM_TILES) * TILE_WIDTH
+        index = add_platform('floating', (left, top, width, PLATFORM_HEIGHT))
+        if width >= MIN_PATROL_WIDTH and rng.random() < ENEMY_CHANCE:
+            enemies.append({'start_pos': [left + width // 2, top], 'platform': index})
+        return index, (left + width, top, JUMP_SPEED)
+
+    index, takeoff = add_ground(0, rng.randint(*START_GROUND_TILES) * TILE_WIDTH, is_start=True)
+    player_start = [TILE_WIDTH * 2, GROUND_TOP_Y]
+
+    for _ in range(SECTION_COUNT):
+        # takeoff: (right edge jumped from, or trampoline centre; top; launch speed)
+        takeoff_x, takeoff_top, launch_speed = takeoff
+        highest = max(MIN_PLATFORM_TOP, int(takeoff_top - max_rise(launch_speed)))
+        lowest = min(MAX_PLATFORM_TOP, takeoff_top + 2 * TILE_WIDTH)
+        top = rng.randint(highest, max(highest, lowest))
+        if launch_speed == BOUNCE_SPEED:
+            # A trampoline bounce is what makes the higher platforms reachable from the
+            # ground. The platform after one is a wide one centred on where the player
+            # comes down holding forward all the way from the bounce.
+            width = PLATFORM_TILES[1] * TILE_WIDTH
+            left = takeoff_x + int(flight_distance(takeoff_top - top, launch_speed)) - width // 2
+            index, takeoff = add_floating(left, top, width)
+        elif rng.random() < GROUND_CHANCE:
+            # Going back down to the ground is always in reach.
+            left = _place_after(rng, takeoff_x, takeoff_top, launch_speed, GROUND_TOP_Y)
+            index, takeoff = add_ground(left, rng.randint(*GROUND_TILES) * TILE_WIDTH)
+        else:
+            left = _place_after(rng, takeoff_x, takeoff_top, launch_speed, top)
+            index, takeoff = add_floating(left, top)
+
+    # The flag goes on the last surface, clear of anything patrolling it, on the ground
+    # as well as on a platform.
+    last_rect = platforms[index]['rect']
+    enemies = [enemy for enemy in enemies if not _overlaps(enemy_span(enemy, platforms), last_rect)]
+    flag = [last_rect[0] + last_rect[2] // 2, last_rect[1] - FLAG_OFFSET]
+
+    return {
+        'version': 1,
+        'seed': seed,
+        'generator_version': GENERATOR_VERSION,
+        'width': last_rect[0] + last_rect[2] + LEVEL_END_MARGIN,
+        'height': HEIGHT,
+        'player_start': player_start,
+        'platforms': platforms,
+        'enemies': enemies,
+        'flag': flag,
+    }
+
+
+def validate_level(level):
+    # Layout rules that don't need a simulation, as readable problems; an empty list
+    # means the level is fine. reachability.py covers whether it can be completed.
+    platforms = level['platforms']
+    flag_x, flag_y = level['flag']
+    flag_surfaces = [entry['rect'] for entry in platforms
+                     if entry['type'] != 'trampoline' and entry['rect'][1] == flag_y + FLAG_OFFSET and
+                     entry['rect'][0] <= flag_x < entry['rect'][0] + entry['rect'][2]]
+    if not flag_surfaces:
+        return ["flag is not standing on a surface"]
+    problems = []
+    for spawn_id, enemy in enumerate(level['enemies']):
+        if _overlaps(enemy_span(enemy, platforms), flag_surfaces[0]):
+            problems.append(f"enemy {spawn_id} patrols the flag's surface")
+    return problems
+
+
+# --- Cache ---
+def cached_level_path(seed, directory=CACHE_DIRECTORY):
+    return os.path.join(directory, f"seed_{seed}_v{GENERATOR_VERSION}.json")
+
+def ensure_level(seed, directory=CACHE_DIRECTORY):
+    # Path of the level for seed, generated and written to the cache on first use. The
+    # file is written under a temporary name and renamed, so processes generating the
+    # same seed at once never leave a half-written level behind.
+    path = cached_level_path(seed, directory)
+    if not os.path.exists(path):
+        level = generate_level(seed)
+        os.makedirs(directory, exist_ok=True)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as level_file:
+            json.dump(level, level_file, separators=(',', ':'))
+        os.replace(temporary_path, path)
+    return path
+
+def generate_levels(seeds, directory=CACHE_DIRECTORY, workers=None):
+    # Cached paths for every seed, generating the missing ones over a process pool.
+    seeds = list(seeds)
+    missing = [seed for seed in seeds if not os.path.exists(cached_level_path(seed, directory))]
+    if missing:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunk_size = max(1, len(missing) // (4 * (workers or os.cpu_count() or 1)))
+            list(pool.map(ensure_level, missing, [directory] * len(missing), chunksize=chunk_size))
+    return [cached_level_path(seed, directory) for seed in seeds]
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate and cache Pixel Peak levels from seeds")
+    parser.add_argument('first_seed', type=int)
+    parser.add_argument('--count', type=int, default=1, help="number of consecutive seeds to generate")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument('--directory', default=CACHE_DIRECTORY)
+    parser.add_argument('--verify', action='store_true', help="check every level can be completed with reachability.py")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    paths = generate_levels(range(args.first_seed, args.first_seed + args.count), args.directory, args.workers)
+    print(f"{len(paths)} levels in {args.directory} in {time.perf_counter() - start:.1f} s")
+
+    if args.verify:
+        from levels import read_level
+        from reachability import analyze_levels
+        failed = set()
+        for path in paths:
+            for problem in validate_level(read_level(path)):
+                print(f"{path}: {problem}")
+                failed.add(path)
+        for report in analyze_levels(paths, args.workers):
+            if not report['flag_reachable']:
+                print(f"{report['level']}: flag UNREACHABLE")
+                failed.add(report['level'])
+        print(f"{len(paths) - len(failed)}/{len(paths)} levels pass")
+        return 1 if failed else 0
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
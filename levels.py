@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+# Level files for Pixel Peak.
+#
+# Two formats describe the same elements (ground, floating platforms, trampolines,
+# patrolling enemies and the flag):
+#
+#   * .json - readable source format, loaded whole by load_level().
+#   * .ppk  - packed binary format split into fixed-width chunks behind an index, read
+#             piece by piece by StreamingLevel as the player moves, so startup time and
+#             memory don't grow with the size of the level.
+#
+# Run "python levels.py pack levels/level_1.json level_1.ppk" to convert between them.
+import argparse
+import json
+import math
+import struct
+
+from world import (
+    WIDTH, HEIGHT, GROUND_TOP_Y, ENEMY_SIZE, PLATFORM_KINDS, Rect, Platform, World, PlayerBody, EnemyBody, FlagBody
+)
+
+DEFAULT_LEVEL_FILE = 'levels/level_1.json'
+
+# --- Packed Format Layout ---
+# header | chunk index (one entry per non-empty chunk) | chunk records
+# Platforms are written into every chunk they overlap, tagged with a level-wide id, so a
+# chunk is self-contained; enemies are written into the chunk holding their start point.
+PACKED_MAGIC = b'PPKL'
+PACKED_VERSION = 1
+DEFAULT_CHUNK_WIDTH = 1024
+
+HEADER_FORMAT = struct.Struct('<4sHIIIffffII')   # magic, version, width, height, chunk width, player x/bottom, flag x/y, enemy total, chunk count
+INDEX_FORMAT = struct.Struct('<iIHH')            # chunk index, file offset, platform count, enemy count
+PLATFORM_FORMAT = struct.Struct('<IBiiii')       # id, type code, x, y, width, height
+ENEMY_FORMAT = struct.Struct('<Iffffi')          # id, start x, start bottom, range start, range end, platform id (-1: none)
+
+# Packed files store the platform kind tags from world.py as they are.
+PLATFORM_TYPE_CODES = PLATFORM_KINDS
+
+# Chunks kept loaded on each side of the one the player is in.
+STREAM_RADIUS = 1
+
+class LevelFormatError(Exception):
+    pass
+
+# --- Level Description Helpers ---
+def _make_platform(platform_type, rect):
+    return Platform(PLATFORM_KINDS[platform_type], Rect(*rect))
+
+def _make_enemy(spawn_id, start_pos, movement_range, platform_rect):
+    enemy = EnemyBody(start_pos=tuple(start_pos), movement_range=tuple(movement_range), platform_rect=platform_rect)
+    enemy.spawn_id = spawn_id
+    return enemy
+
+def _enemy_range(enemy_data, platform_rect):
+    if 'movement_range' in enemy_data:
+        return enemy_data['movement_range']
+    return (platform_rect.left, platform_rect.right)
+
+# --- JSON Format ---
+def read_level(path):
+    with open(path, encoding='utf-8') as level_file:
+        level = json.load(level_file)
+    if level.get('version', 1) != 1:
+        raise LevelFormatError(f"{path}: unsupported level version {level.get('version')}")
+    return level
+
+def build_world(level, **world_options):
+    platforms = [_make_platform(entry['type'], entry['rect']) for entry in level['platforms']]
+
+    enemies = []
+    for spawn_id, enemy_data in enumerate(level.get('enemies', [])):
+        platform_index = enemy_data.get('platform')
+        platform_rect = platforms[platform_index].rect if platform_index is not None else None
+        enemies.append(_make_enemy(spawn_id, enemy_data['start_pos'], _enemy_range(enemy_data, platform_rect), platform_rect))
+
+    flag = FlagBody(tuple(level['flag'])) if level.get('flag') else None
+    player = PlayerBody(tuple(level.get('player_start', (WIDTH - 100, GROUND_TOP_Y))))
+    return World(platforms, enemies, flag, player=player,
+                 width=level.get('width', WIDTH), height=level.get('height', HEIGHT), **world_options)
+
+def load_level(path, level_data=None, **world_options):
+    # level_data: an already parsed .json level (see read_level) to build from instead of
+    # reading path again.
+    if path.endswith('.ppk'):
+        return StreamingLevel(path, **world_options)
+    if level_data is None:
+        level_data = read_level(path)
+    return StaticLevel(build_world(level_data, **world_options))
+
+# --- Packed Format ---
+def pack_level(level, path, chunk_width=DEFAULT_CHUNK_WIDTH):
+    width = level.get('width', WIDTH)
+    height = level.get('height', HEIGHT)
+    chunk_count = max(1, math.ceil(width / chunk_width))
+    chunk_platforms = [[] for _ in range(chunk_count)]
+    chunk_enemies = [[] for _ in range(chunk_count)]
+
+    def chunk_of(x):
+        return min(max(int(x // chunk_width), 0), chunk_count - 1)
+
+    for platform_id, entry in enumerate(level['platforms']):
+        x, y, w, h = entry['rect']
+        record = PLATFORM_FORMAT.pack(platform_id, PLATFORM_TYPE_CODES[entry['type']], x, y, w, h)
+        for chunk_index in range(chunk_of(x), chunk_of(x + w - 1) + 1):
+            chunk_platforms[chunk_index].append(record)
+
+    for spawn_id, enemy_data in enumerate(level.get('enemies', [])):
+        platform_index = enemy_data.get('platform')
+        platform_rect = Rect(*level['platforms'][platform_index]['rect']) if platform_index is not None else None
+        range_start, range_end = _enemy_range(enemy_data, platform_rect)
+        start_x, start_bottom = enemy_data['start_pos']
+        record = ENEMY_FORMAT.pack(spawn_id, start_x, start_bottom, range_start, range_end,
+                                   -1 if platform_index is None else platform_index)
+        chunk_enemies[chunk_of(start_x)].append(record)
+
+    used_chunks = [i for i in range(chunk_count) if chunk_platforms[i] or chunk_enemies[i]]
+    player_x, player_bottom = level.get('player_start', (WIDTH - 100, GROUND_TOP_Y))
+    flag_x, flag_y = level['flag'] if level.get('flag') else (math.nan, math.nan)
+
+    offset = HEADER_FORMAT.size + INDEX_FORMAT.size * len(used_chunks)
+    index_entries = []
+    for chunk_index in used_chunks:
+        index_entries.append(INDEX_FORMAT.pack(chunk_index, offset, len(chunk_platforms[chunk_index]), len(chunk_enemies[chunk_index])))
+        offset += PLATFORM_FORMAT.size * len(chunk_platforms[chunk_index]) + ENEMY_FORMAT.size * len(chunk_enemies[chunk_index])
+
+    with open(path, 'wb') as packed_file:
+        packed_file.write(HEADER_FORMAT.pack(PACKED_MAGIC, PACKED_VERSION, width, height, chunk_width,
+                                             player_x, player_bottom, flag_x, flag_y,
+                                             len(level.get('enemies', [])), len(used_chunks)))
+        packed_file.writelines(index_entries)
+        for chunk_index in used_chunks:
+            packed_file.writelines(chunk_platforms[chunk_index])
+            packed_file.writelines(chunk_enemies[chunk_index])
+
+class StaticLevel:
+    # A level that is fully in memory; stream() is a no-op so callers can treat both
+    # kinds of level the same way.
+    # Its World can be rolled back with World.snapshot()/restore().
+    supports_snapshots = True
+
+    def __init__(self, level_world):
+        self.world = level_world
+
+    def stream(self, focus_x):
+        pass
+
+    def close(self):
+        pass
+
+class StreamingLevel:
+    # Keeps only the chunks around the player loaded from a .ppk file. Platforms are
+    # reference counted across the chunks that contain them; enemies leave the world with
+    # their chunk and come back on the next load unless they were defeated.
+    # World snapshots don't cover which chunks are loaded, so they aren't used here.
+    supports_snapshots = False
+
+    def __init__(self, path, stream_radius=STREAM_RADIUS, **world_options):
+        self.stream_radius = stream_radius
+        self.file = open(path, 'rb')
+        header = self.file.read(HEADER_FORMAT.size)
+        if len(header) != HEADER_FORMAT.size:
+            raise LevelFormatError(f"{path}: truncated header")
+        (magic, version, width, height, self.chunk_width, player_x, player_bottom,
+         flag_x, flag_y, enemy_total, chunk_count) = HEADER_FORMAT.unpack(header)
+        if magic != PACKED_MAGIC or version != PACKED_VERSION:
+            raise LevelFormatError(f"{path}: not a version {PACKED_VERSION} packed level")
+
+        self.index = {}
+        index_data = self.file.read(INDEX_FORMAT.size * chunk_count)
+        for chunk_index, offset, platform_count, enemy_count in INDEX_FORMAT.iter_unpack(index_data):
+            self.index[chunk_index] = (offset, platform_count, enemy_count)
+
+        self.loaded_chunks = {}
+        self.platforms_by_id = {}
+        self.platform_refs = {}
+        self.live_enemy_ids = set()
+
+        if 'batched_enemies' not in world_options:
+            from world import SWARM_MIN_ENEMIES
+            from enemy_swarm import numpy_available
+            world_options['batched_enemies'] = numpy_available() and enemy_total >= SWARM_MIN_ENEMIES
+        flag = None if math.isnan(flag_x) else FlagBody((flag_x, flag_y))
+        self.world = World([], [], flag, player=PlayerBody((player_x, player_bottom)),
+                           width=width, height=height, **world_options)
+        self.stream(self.world.player.x)
+
+    def _read_chunk(self, chunk_index):
+        offset, platform_count, enemy_count = self.index[chunk_index]
+        self.file.seek(offset)
+        platform_bytes = PLATFORM_FORMAT.size * platform_count
+        data = self.file.read(platform_bytes + ENEMY_FORMAT.size * enemy_count)
+        return (list(PLATFORM_FORMAT.iter_unpack(data[:platform_bytes])),
+                list(ENEMY_FORMAT.iter_unpack(data[platform_bytes:])))
+
+    def load_chunk(self, chunk_index):
+        platform_ids = []
+        enemies = []
+        if chunk_index in self.index:
+            platform_records, enemy_records = self._read_chunk(chunk_index)
+            for platform_id, type_code, x, y, w, h in platform_records:
+                platform_ids.append(platform_id)
+                self.platform_refs[platform_id] = self.platform_refs.get(platform_id, 0) + 1
+                if platform_id not in self.platforms_by_id:
+                    platform_data = Platform(type_code, Rect(x, y, w, h))
+                    self.platforms_by_id[platform_id] = platform_data
+                    self.world.add_platform(platform_data)
+
+            for spawn_id, start_x, start_bottom, range_start, range_end, platform_id in enemy_records:
+                # Enemies that were squashed, or that wandered off and are still alive in a
+                # neighbouring chunk, must not be spawned a second time.
+                if spawn_id in self.world.defeated_enemy_ids or spawn_id in self.live_enemy_ids:
+                    continue
+                self.live_enemy_ids.add(spawn_id)
+                platform_rect = self.platforms_by_id[platform_id].rect if platform_id >= 0 else None
+                enemies.append(_make_enemy(spawn_id, (start_x, start_bottom), (range_start, range_end), platform_rect))
+            self.world.add_enemies(enemies)
+        self.loaded_chunks[chunk_index] = platform_ids
+
+    def unload_chunk(self, chunk_index):
+        for platform_id in self.loaded_chunks.pop(chunk_index):
+            self.platform_refs[platform_id] -= 1
+            if self.platform_refs[platform_id] == 0:
+                del self.platform_refs[platform_id]
+                self.world.remove_platform(self.platforms_by_id.pop(platform_id))
+
+        chunk_left = chunk_index * self.chunk_width
+        self.live_enemy_ids.difference_update(self.world.unload_enemies(chunk_left, chunk_left + self.chunk_width))
+
+    def stream(self, focus_x):
+        # Loads the chunks within stream_radius of focus_x and unloads the rest.
+        last_chunk = max(0, (self.world.width - 1) // self.chunk_width)
+        centre = min(max(int(focus_x // self.chunk_width), 0), last_chunk)
+        wanted = set(range(max(centre - self.stream_radius, 0), min(centre + self.stream_radius, last_chunk) + 1))
+        for chunk_index in sorted(set(self.loaded_chunks) - wanted):
+            self.unload_chunk(chunk_index)
+        for chunk_index in sorted(wanted - set(self.loaded_chunks)):
+            self.load_chunk(chunk_index)
+        # Enemies only move while they overlap the loaded span. Bringing its inner edges in
+        # by an enemy's width stops them while they still stand on loaded ground.
+        left = min(wanted) * self.chunk_width
+        right = (max(wanted) + 1) * self.chunk_width
+        if min(wanted) > 0:
+            left += ENEMY_SIZE[0]
+        if max(wanted) < last_chunk:
+            right -= ENEMY_SIZE[0]
+        self.world.set_loaded_span(left, right)
+
+    def close(self):
+        self.file.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Pixel Peak level tools")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    pack_command = subcommands.add_parser('pack', help="convert a .json level into a chunked .ppk level")
+    pack_command.add_argument('source')
+    pack_command.add_argument('destination')
+    pack_command.add_argument('--chunk-width', type=int, default=DEFAULT_CHUNK_WIDTH)
+    args = parser.parse_args()
+
+    if args.command == 'pack':
+        pack_level(read_level(args.source), args.destination, args.chunk_width)
+
+if __name__ == '__main__':
+    main()
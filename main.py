@@ -1,12 +1,33 @@
 # -*- coding: utf-8 -*-
+import json
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait as wait_for_futures
+
 import pgzrun
 import pygame # Class Rect
+from pgzero import ptext
+
+import game_loop
+from audio import AudioMixer, read_music_file
+from animation import ENEMY_SQUASHED, ENEMY_WALK_LEFT, ENEMY_WALK_RIGHT, clip_sprite_names, resolve_clips
+from world import (
+    EVENT_ENEMY_SQUASHED, EVENT_PLAYER_HIT, EVENT_PLAYER_FELL,
+    EVENT_FLAG_COLLECTED, PLATFORM_GROUND, PLATFORM_FLOATING, InputState, Rect
+)
+from levels import DEFAULT_LEVEL_FILE, load_level, read_level
+from level_generator import ensure_level
+from perf import monitor as perf_monitor
+from replay import REPLAY_DIRECTORY, InputRecorder, new_replay_path
 
 # --- Window Settings ---
 WIDTH = 1300
 HEIGHT = 700
 TITLE = "Pixel Peak"
 FULLSCREEN = False
+# WIDTH x HEIGHT is the resolution the game is drawn at. A larger window (WINDOW_SCALE) or
+# FULLSCREEN shows that picture upscaled once per frame by game_loop.py.
+WINDOW_SCALE = 1
+INTEGER_SCALING = True
 
 # --- Game State Management ---
 GAME_STATE_MAIN_MENU = 'main_menu'
@@ -21,6 +42,8 @@ current_game_state = GAME_STATE_MAIN_MENU
 is_sound_on = True
 # Definindo o volume padrão da música (0.0 a 1.0)
 MUSIC_VOLUME = 0.2
+# Every sound and music change goes through sound_mixer and is played at the end of update().
+sound_mixer = AudioMixer(sounds.load, MUSIC_VOLUME)
 
 # --- Menu Settings ---
 SKY_BLUE = (135, 206, 235)
@@ -34,14 +57,53 @@ sound_button = pygame.Rect((WIDTH / 2 - 150, HEIGHT / 2 + 30), (300, 60))
 exit_button = pygame.Rect((WIDTH / 2 - 150, HEIGHT / 2 + 110), (300, 60))
 
 # --- Helper Drawing Functions ---
-def draw_rounded_rect(rect, color, radius):
-    screen.draw.filled_rect(pygame.Rect(rect.left + radius, rect.top, rect.width - 2 * radius, rect.height), color)
-    screen.draw.filled_rect(pygame.Rect(rect.left, rect.top + radius, rect.width, rect.height - 2 * radius), color)
-    
-    screen.draw.filled_circle((rect.left + radius, rect.top + radius), radius, color)
-    screen.draw.filled_circle((rect.right - radius, rect.top + radius), radius, color)
-    screen.draw.filled_circle((rect.left + radius, rect.bottom - radius), radius, color)
-    screen.draw.filled_circle((rect.right - radius, rect.bottom - radius), radius, color)
+def draw_rounded_rect(target, rect, color, radius):
+    pygame.draw.rect(target, color, pygame.Rect(rect.left + radius, rect.top, rect.width - 2 * radius, rect.height))
+    pygame.draw.rect(target, color, pygame.Rect(rect.left, rect.top + radius, rect.width, rect.height - 2 * radius))
+
+    pygame.draw.circle(target, color, (rect.left + radius, rect.top + radius), radius)
+    pygame.draw.circle(target, color, (rect.right - radius, rect.top + radius), radius)
+    pygame.draw.circle(target, color, (rect.left + radius, rect.bottom - radius), radius)
+    pygame.draw.circle(target, color, (rect.right - radius, rect.bottom - radius), radius)
+
+# --- Cached Text and Buttons ---
+# Text is rasterized once per (string, font size, color, outline) and buttons are
+# composited once per label, so static screens are a handful of blits per frame.
+_text_surfaces = {}
+_button_surfaces = {}
+
+def get_text_surface(text, fontsize, color, owidth=None, ocolor=None):
+    key = (text, fontsize, color, owidth, ocolor)
+    surface = _text_surfaces.get(key)
+    if surface is None:
+        perf_monitor.count('text_renders')
+        surface = _text_surfaces[key] = ptext.getsurf(text, fontsize=fontsize, color=color,
+                                                      owidth=owidth, ocolor=ocolor, cache=False)
+    return surface
+
+def draw_cached_text(text, center, fontsize, color, owidth=None, ocolor=None):
+    surface = get_text_surface(text, fontsize, color, owidth, ocolor)
+    screen.surface.blit(surface, (int(round(center[0] - surface.get_width() / 2)),
+                                  int(round(center[1] - surface.get_height() / 2))))
+
+def get_button_surface(rect, label):
+    # One surface per button position, rebuilt only when its label changes (the sound
+    # toggle is the only button whose label does).
+    button_key = (rect.left, rect.top, rect.width, rect.height)
+    cached = _button_surfaces.get(button_key)
+    if cached is not None and cached[0] == label:
+        return cached[1]
+
+    surface = pygame.Surface(rect.size, pygame.SRCALPHA)
+    draw_rounded_rect(surface, pygame.Rect((0, 0), rect.size), STEEL_BLUE, BUTTON_RADIUS)
+    text_surface = get_text_surface(label, 35, WHITE)
+    surface.blit(text_surface, (int(round(rect.width / 2 - text_surface.get_width() / 2)),
+                                int(round(rect.height / 2 - text_surface.get_height() / 2))))
+    _button_surfaces[button_key] = (label, surface)
+    return surface
+
+def draw_button(rect, label):
+    screen.surface.blit(get_button_surface(rect, label), rect.topleft)
 
 # --- Game Variables and Classes ---
 
@@ -57,519 +119,794 @@ GROUND_TILE_NAME = 'ground'
 FLOATING_TILE_PREFIX = 'platform'
 TRAMPOLINE_IDLE_NAME = 'spring'
 TRAMPOLINE_ACTIVE_NAME = 'spring_out'
-TRAMPOLINE_JUMP_BOOST = -800
-TRAMPOLINE_ANIMATION_DURATION = 0.2
 
-# Y position of the ground top
-GROUND_TOP_Y = HEIGHT - 50
+# Player, enemy and flag frames come from the clips in animation.py.
+SPRITE_NAMES = ([GROUND_TILE_NAME, f"{FLOATING_TILE_PREFIX}_left", f"{FLOATING_TILE_PREFIX}_middle",
+                 f"{FLOATING_TILE_PREFIX}_right", TRAMPOLINE_IDLE_NAME, TRAMPOLINE_ACTIVE_NAME] +
+                clip_sprite_names())
+SOUND_NAMES = ["squash_sound", "game_over_sound", "win_sound"]
+MUSIC_NAMES = ["menu_music", "game_music"]
 
 # Dictionary to store pre-loaded images
 _images_loaded = {}
 
+# Sprites packed by build_atlas.py are cut out of one atlas surface; anything missing from
+# its manifest is loaded from its own PNG as before.
+ATLAS_MANIFEST_FILE = 'images/atlas.json'
+_atlas = None
+
+def read_atlas():
+    # Reads and decodes the atlas without touching the display, so it can run on a
+    # preloader thread; install_atlas() finishes the job on the main thread.
+    try:
+        with open(ATLAS_MANIFEST_FILE, encoding='utf-8') as manifest_file:
+            manifest = json.load(manifest_file)
+        return pygame.image.load(f"images/{manifest['image']}"), manifest['sprites']
+    except (OSError, ValueError, KeyError, pygame.error):
+        return None, {}
+
+def install_atlas(atlas_data):
+    global _atlas
+    surface, sprites = atlas_data
+    if surface is None:
+        _atlas = {'surface': None, 'sprites': {}}
+    else:
+        _atlas = {'surface': surface.convert_alpha(), 'sprites': sprites}
+    return _atlas
+
+def load_atlas():
+    return install_atlas(read_atlas())
+
+def read_image_file(image_name):
+    try:
+        return pygame.image.load(f"images/{image_name}.png")
+    except Exception:
+        return None
+
+def install_image(image_name, image):
+    if image_name not in _images_loaded:
+        _images_loaded[image_name] = image.convert_alpha() if image is not None else None
+
 def get_image_asset(image_name):
     if image_name not in _images_loaded:
-        try:
-            _images_loaded[image_name] = pygame.image.load(f"images/{image_name}.png").convert_alpha()
-        except FileNotFoundError:
-            _images_loaded[image_name] = None
-        except Exception:
-            _images_loaded[image_name] = None
+        perf_monitor.count('image_cache_misses')
+        atlas = _atlas if _atlas is not None else load_atlas()
+        if image_name in atlas['sprites']:
+            _images_loaded[image_name] = atlas['surface'].subsurface(pygame.Rect(atlas['sprites'][image_name]))
+            return _images_loaded[image_name]
+        install_image(image_name, read_image_file(image_name))
     return _images_loaded[image_name]
 
-# --- Actor Classes (Player, Enemy, Flag) ---
-class Player(Actor):
-    def __init__(self):
-        try:
-            super().__init__('player_idle_0')
-            self.image_loaded_successfully = True
-        except Exception:
-            super().__init__('blank')
-            self.width = 60
-            self.height = 80
-            self.image_loaded_successfully = False
-
-        self.midbottom = (WIDTH - 100, GROUND_TOP_Y)
-        self.vx = 0
-        self.vy = 0
-        self.speed = 300
-        self.jump_power = -570
-        self.gravity = 800
-        self.on_ground = True
-
-        self.current_animation_state = "idle"
-        self.facing_direction = "right"
-
-        self.idle_frames = ["player_idle_0", "player_idle_1"]
-        self.walk_right_frame = "player_right"
-        self.walk_left_frame = "player_left"
-        self.jump_frame = "player_jump"
-
-        self.current_frame_index = 0
-        self.animation_timer = 0
-        self.animation_speed = 0.5
-
-    def update(self, dt):
-        global current_game_state
-
-        if current_game_state not in [GAME_STATE_IN_GAME]:
-            return
-
-        self.animation_timer += dt
-
-        self.vx = 0
-        is_moving_horizontally = False
-
-        if keyboard.left or keyboard.a:
-            self.vx = -self.speed
-            self.facing_direction = "left"
-            is_moving_horizontally = True
-        elif keyboard.right or keyboard.d:
-            self.vx = self.speed
-            self.facing_direction = "right"
-            is_moving_horizontally = True
-
-        if not self.on_ground:
-            self.vy += self.gravity * dt
-            if self.vy > 500:
-                self.vy = 500
-
-        if keyboard.space and self.on_ground:
-            self.vy = self.jump_power
-            self.on_ground = False
-            self.current_animation_state = "jumping"
-
-        if not self.on_ground:
-            if self.vy < 0:
-                self.current_animation_state = "jumping"
-            elif self.vy > 0:
-                self.current_animation_state = "falling"
-        elif is_moving_horizontally:
-            self.current_animation_state = "walking"
-        elif self.on_ground and not is_moving_horizontally:
-            self.current_animation_state = "idle"
-
-        self.x += self.vx * dt
-        for platform_data in PLATFORMS:
-            platform_rect = platform_data['rect']
-            if self.colliderect(platform_rect):
-                if self.vx > 0:
-                    self.right = platform_rect.left
-                elif self.vx < 0:
-                    self.left = platform_rect.right
-
-        if self.left < 0:
-            self.left = 0
-            self.vx = 0
-        if self.right > WIDTH:
-            self.right = WIDTH
-            self.vx = 0
-
-        self.y += self.vy * dt
-        was_on_ground_this_frame = False
-
-        for platform_data in PLATFORMS:
-            platform_rect = platform_data['rect']
-            if self.colliderect(platform_rect):
-                if self.vy >= 0: 
-                    self.bottom = platform_rect.top
-                    self.vy = 0
-                    was_on_ground_this_frame = True
-
-                    if platform_data['type'] == 'trampoline':
-                        self.vy = TRAMPOLINE_JUMP_BOOST
-                        self.on_ground = False
-                        self.current_animation_state = "jumping"
-                        platform_data['animation_timer'] = TRAMPOLINE_ANIMATION_DURATION
-
-                    if self.current_animation_state in ["jumping", "falling"]:
-                        if is_moving_horizontally:
-                            self.current_animation_state = "walking"
-                        else:
-                            self.current_animation_state = "idle"
-
-                elif self.vy < 0:
-                    self.top = platform_rect.bottom
-                    self.vy = 0
-                    self.current_animation_state = "falling"
-
-        # --- Enemy Collision Logic ---
-        for enemy in ENEMIES:
-            if not enemy.is_squashed and self.colliderect(enemy):
-                if self.vy >= 0 and self.bottom <= enemy.top + (enemy.height / 3):
-                    enemy.squash()
-                    self.vy = self.jump_power / 2
-                    self.on_ground = False
-                else:
-                    current_game_state = GAME_STATE_GAME_OVER
-                    if is_sound_on:
-                        sounds.game_over_sound.play()
-                    return
-
-        # --- Flag Collision Logic ---
-        global flag
-        if flag and not flag.collected and self.colliderect(flag):
-            flag.collect()
-            current_game_state = GAME_STATE_WON
-            if is_sound_on:
-                music.stop()
-                sounds.win_sound.play()
-            return
-
-        self.on_ground = was_on_ground_this_frame
-
-        if self.top > HEIGHT: 
-            current_game_state = GAME_STATE_GAME_OVER
-            if is_sound_on:
-                music.stop()
-                sounds.game_over_sound.play()
-            return
-
-        # Player Animation Logic
-        if self.image_loaded_successfully:
-            if self.current_animation_state == "idle":
-                frames_to_use = self.idle_frames
-                if self.animation_timer >= self.animation_speed:
-                    self.animation_timer = 0
-                    self.current_frame_index = (self.current_frame_index + 1) % len(frames_to_use)
-                    self.image = frames_to_use[self.current_frame_index]
-                elif self.image not in self.idle_frames:
-                    self.image = frames_to_use[self.current_frame_index]
-            elif self.current_animation_state == "walking":
-                if self.facing_direction == "right":
-                    self.image = self.walk_right_frame
-                else:
-                    self.image = self.walk_left_frame
-                if self.image not in [self.walk_right_frame, self.walk_left_frame]:
-                    self.current_frame_index = 0
-                    self.animation_timer = 0
-            elif self.current_animation_state in ["jumping", "falling"]:
-                self.image = self.jump_frame
-                if self.image != self.jump_frame:
-                    self.current_frame_index = 0
-                    self.animation_timer = 0
-
-
-class Enemy(Actor):
-    def __init__(self, start_pos, movement_range, platform_rect=None):
-        try:
-            super().__init__('enemy_walk_right_0')
-            self.image_loaded_successfully = True
-        except Exception:
-            super().__init__('blank')
-            self.width = 60
-            self.height = 60
-            self.image_loaded_successfully = False
-
-        self.midbottom = start_pos
-        self.speed = 100
-        self.vx = self.speed
-        self.movement_start = movement_range[0]
-        self.movement_end = movement_range[1]
-        self.platform_rect = platform_rect
-
-        self.walk_right_frames = ["enemy_walk_right_0", "enemy_walk_right_1"]
-        self.walk_left_frames = ["enemy_walk_left_0", "enemy_walk_left_1"]
-        self.squashed_frame = "enemy_squashed"
-
-        self.current_frame_index = 0
-        self.animation_timer = 0
-        self.animation_speed = 0.4
-
-        self.is_squashed = False
-        self.squashed_timer = 0.0
-        self.SQUASH_DURATION = 0.5
-
-    def update(self, dt):
-        global current_game_state
-
-        if current_game_state not in [GAME_STATE_IN_GAME]:
-            return
-
-        if self.is_squashed:
-            self.squashed_timer -= dt
-            if self.squashed_timer <= 0:
-                if self in ENEMIES:
-                    ENEMIES.remove(self)
-            return
-
-        self.animation_timer += dt
-
-        self.x += self.vx * dt
-
-        if self.platform_rect:
-            if self.vx < 0 and self.left <= self.platform_rect.left:
-                self.left = self.platform_rect.left
-                self.vx = self.speed
-            elif self.vx > 0 and self.right >= self.platform_rect.right:
-                self.right = self.platform_rect.right
-                self.vx = -self.speed
+# --- Scaled Image Cache ---
+# Transformed copies of the assets above, keyed on (image name, size, flip), kept in LRU
+# order under a byte budget so draw paths never rescale the same sprite twice.
+SCALED_IMAGE_CACHE_BUDGET = 16 * 1024 * 1024 # bytes
+_scaled_images = OrderedDict()
+_scaled_images_size = 0
+scaled_image_cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+def _surface_size_in_bytes(surface):
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+def get_scaled_image_asset(image_name, size=None, flip_x=False, flip_y=False):
+    global _scaled_images_size
+
+    image = get_image_asset(image_name)
+    if image is None:
+        return None
+
+    if size is None:
+        size = image.get_size()
+    else:
+        size = (int(size[0]), int(size[1]))
+    if size == image.get_size() and not flip_x and not flip_y:
+        return image
+
+    key = (image_name, size, flip_x, flip_y)
+    cached = _scaled_images.get(key)
+    if cached is not None:
+        _scaled_images.move_to_end(key)
+        scaled_image_cache_stats['hits'] += 1
+        return cached
+
+    scaled_image_cache_stats['misses'] += 1
+    perf_monitor.count('scaled_cache_misses')
+    transformed = image
+    if size != image.get_size():
+        transformed = pygame.transform.scale(transformed, size)
+    if flip_x or flip_y:
+        transformed = pygame.transform.flip(transformed, flip_x, flip_y)
+
+    transformed_size = _surface_size_in_bytes(transformed)
+    if transformed_size > SCALED_IMAGE_CACHE_BUDGET:
+        return transformed
+
+    _scaled_images[key] = transformed
+    _scaled_images_size += transformed_size
+    while _scaled_images_size > SCALED_IMAGE_CACHE_BUDGET:
+        _, evicted = _scaled_images.popitem(last=False)
+        _scaled_images_size -= _surface_size_in_bytes(evicted)
+        scaled_image_cache_stats['evictions'] += 1
+    return transformed
+
+# --- Static Level Layer ---
+# Ground and floating platforms never change during a level, so they are tiled once onto
+# opaque surfaces (background included). The layer is cut into STATIC_CHUNK_WIDTH columns
+# that are built the first time the camera sees them, so only one or two blits per frame
+# are needed however long the level is.
+STATIC_CHUNK_WIDTH = WIDTH
+STATIC_LAYER = None
+
+def draw_ground_tiles(target, platform_rect, offset_x=0, offset_y=0):
+    left = platform_rect.x - offset_x
+    top = platform_rect.y - offset_y
+    ground_image = get_image_asset(GROUND_TILE_NAME)
+    if ground_image is None:
+        target.fill(DEBUG_MISSING_IMAGE_COLOR_PLATFORM, pygame.Rect(left, top, platform_rect.width, platform_rect.height))
+        return
+
+    tile_width = ground_image.get_width()
+    scaled_ground_image = get_scaled_image_asset(GROUND_TILE_NAME, (tile_width, platform_rect.height))
+
+    # Only the tiles that land on the target are blitted, so very long ground strips
+    # cost the same as short ones.
+    first_offset = max(0, (-left) // tile_width * tile_width)
+    last_offset = min(platform_rect.width, target.get_width() - left)
+    tile_offsets = range(first_offset, last_offset, tile_width)
+    for x_offset in tile_offsets:
+        target.blit(scaled_ground_image, (left + x_offset, top))
+    perf_monitor.count('blits', len(tile_offsets))
+
+def draw_floating_tiles(target, platform_rect, offset_x=0, offset_y=0):
+    left_edge_name = f"{FLOATING_TILE_PREFIX}_left"
+    middle_name = f"{FLOATING_TILE_PREFIX}_middle"
+    right_edge_name = f"{FLOATING_TILE_PREFIX}_right"
+
+    left = platform_rect.x - offset_x
+    top = platform_rect.y - offset_y
+    img_middle = get_image_asset(middle_name)
+
+    if img_middle is None:
+        target.fill(DEBUG_MISSING_IMAGE_COLOR_PLATFORM, pygame.Rect(left, top, platform_rect.width, platform_rect.height))
+        return
+
+    original_tile_width = img_middle.get_width()
+    target_tile_height = platform_rect.height
+
+    tile_size = (original_tile_width, target_tile_height)
+    scaled_img_left_edge = get_scaled_image_asset(left_edge_name, tile_size)
+    scaled_img_middle = get_scaled_image_asset(middle_name, tile_size)
+    scaled_img_right_edge = get_scaled_image_asset(right_edge_name, tile_size)
+
+    if scaled_img_left_edge:
+        target.blit(scaled_img_left_edge, (left, top))
+        perf_monitor.count('blits')
+    else:
+        target.fill(DEBUG_MISSING_IMAGE_COLOR_PLATFORM, pygame.Rect(left, top, original_tile_width, target_tile_height))
+
+    middle_tiles_width = platform_rect.width - (2 * original_tile_width)
+    if middle_tiles_width > 0:
+        middle_offsets = range(original_tile_width, platform_rect.width - original_tile_width, original_tile_width)
+        for x_offset in middle_offsets:
+            target.blit(scaled_img_middle, (left + x_offset, top))
+        perf_monitor.count('blits', len(middle_offsets))
+
+    right_edge_x = left + platform_rect.width - original_tile_width
+    if scaled_img_right_edge:
+        target.blit(scaled_img_right_edge, (right_edge_x, top))
+        perf_monitor.count('blits')
+    else:
+        target.fill(DEBUG_MISSING_IMAGE_COLOR_PLATFORM, pygame.Rect(right_edge_x, top, original_tile_width, target_tile_height))
+
+class StaticLayer:
+    def __init__(self, level_world, chunk_width=STATIC_CHUNK_WIDTH):
+        self.world = level_world
+        self.chunk_width = chunk_width
+        self.chunks = {}
+
+    def build_chunk(self, index):
+        chunk_left = index * self.chunk_width
+        chunk = pygame.Surface((self.chunk_width, self.world.height)).convert()
+        chunk.fill(BACKGROUND_COLOR)
+        chunk_area = pygame.Rect(chunk_left, 0, self.chunk_width, self.world.height)
+        for platform_data in self.world.platform_grid.query(chunk_area):
+            if platform_data.kind == PLATFORM_GROUND:
+                draw_ground_tiles(chunk, platform_data.rect, chunk_left)
+            elif platform_data.kind == PLATFORM_FLOATING:
+                draw_floating_tiles(chunk, platform_data.rect, chunk_left)
+        return chunk
+
+    def invalidate_changed_areas(self):
+        # Streamed levels add and remove platforms; any baked column they touch is dropped
+        # and rebuilt on its next draw.
+        for area in self.world.changed_areas:
+            first_index = int(area.left // self.chunk_width)
+            last_index = int((area.right - 1) // self.chunk_width)
+            for index in range(first_index, last_index + 1):
+                self.chunks.pop(index, None)
+        self.world.changed_areas.clear()
+
+    def draw(self, target, view):
+        if self.world.changed_areas:
+            self.invalidate_changed_areas()
+
+        first_index = max(int(view.left // self.chunk_width), 0)
+        last_index = int((view.right - 1) // self.chunk_width)
+        last_index = min(last_index, (self.world.width - 1) // self.chunk_width)
+        for index in range(first_index, last_index + 1):
+            chunk = self.chunks.get(index)
+            if chunk is None:
+                chunk = self.chunks[index] = self.build_chunk(index)
+            target.blit(chunk, (index * self.chunk_width - view.left, -view.top))
+            perf_monitor.count('blits')
+
+        # Columns more than one step away from the view are released to keep memory flat.
+        for index in [index for index in self.chunks if not first_index - 1 <= index <= last_index + 1]:
+            del self.chunks[index]
+
+# --- Camera ---
+# World-to-screen offset that follows the player and stays inside the level bounds.
+# draw() skips anything outside its view, and with CULL_OFFSCREEN_UPDATES enemies beyond
+# UPDATE_CULL_MARGIN of it are frozen until the camera gets near them again.
+CULL_OFFSCREEN_UPDATES = False
+UPDATE_CULL_MARGIN = 256
+# Slack around the view when asking the enemy grid what to draw, covering interpolation.
+ENEMY_DRAW_MARGIN = 64
+
+class Camera:
+    def __init__(self, width, height):
+        self.left = 0
+        self.top = 0
+        self.width = width
+        self.height = height
+
+    right = property(lambda self: self.left + self.width)
+    bottom = property(lambda self: self.top + self.height)
+
+    def follow(self, target_x, target_y, level_width, level_height):
+        # Whole-pixel offsets keep the pixel art from shimmering while scrolling.
+        self.left = int(min(max(target_x - self.width / 2, 0), max(level_width - self.width, 0)))
+        self.top = int(min(max(target_y - self.height / 2, 0), max(level_height - self.height, 0)))
+
+    def is_visible(self, left, top, width, height):
+        return (left < self.left + self.width and self.left < left + width and
+                top < self.top + self.height and self.top < top + height)
+
+    def get_region(self, margin=0):
+        return Rect(self.left - margin, self.top - margin, self.width + 2 * margin, self.height + 2 * margin)
+
+camera = Camera(WIDTH, HEIGHT)
+
+# --- Simulation Timing ---
+# With the fixed timestep enabled, update() hands frame time to World.advance(), which runs
+# physics in PHYSICS_TICK_RATE ticks; draw() interpolates bodies between the last two ticks
+# by the world's render_alpha so rendering stays smooth at any tick rate.
+FIXED_TIMESTEP_ENABLED = True
+PHYSICS_TICK_RATE = 120 # ticks per second
+MAX_PHYSICS_STEPS_PER_FRAME = 8
+
+# --- Body Rendering ---
+# The simulation lives in world.py and picks each body's animation clip; clip_frames holds
+# every clip's surfaces, resolved once per level by initialize_game_elements().
+clip_frames = {}
+
+def get_animation_frame(cursor):
+    return clip_frames[cursor.clip][cursor.frame_index]
+
+def get_interpolation_offset(body):
+    if not FIXED_TIMESTEP_ENABLED or body.previous_pos is None:
+        return 0, 0
+    previous_x, previous_y = body.previous_pos
+    blend = world.render_alpha - 1.0
+    return (body.x - previous_x) * blend, (body.y - previous_y) * blend
+
+def queue_body(body, image, missing_image_color):
+    offset_x, offset_y = get_interpolation_offset(body)
+    left = body.left + offset_x - camera.left
+    top = body.top + offset_y - camera.top
+    if not (-body.width < left < camera.width and -body.height < top < camera.height):
+        return
+    queue_sprite(image, left, top, body.width, body.height, missing_image_color)
+
+def queue_trampoline(platform_data):
+    platform_rect = platform_data.rect
+    current_trampoline_image_name = TRAMPOLINE_IDLE_NAME
+    if platform_data.animation_timer > 0:
+        current_trampoline_image_name = TRAMPOLINE_ACTIVE_NAME
+    trampoline_image = get_scaled_image_asset(current_trampoline_image_name, platform_rect.size)
+    queue_sprite(trampoline_image, platform_rect.x - camera.left, platform_rect.y - camera.top,
+                 platform_rect.width, platform_rect.height, DEBUG_MISSING_IMAGE_COLOR_PLATFORM)
+
+def queue_enemy_swarm(swarm):
+    # Vectorized counterpart of queue_body() for the NumPy enemy store: visibility and
+    # interpolation are worked out for the whole swarm at once.
+    left = swarm.x - camera.left
+    top = swarm.y - camera.top
+    if FIXED_TIMESTEP_ENABLED and swarm.previous_x is not None:
+        blend = world.render_alpha - 1.0
+        left = left + (swarm.x + swarm.width / 2 - swarm.previous_x) * blend
+        top = top + (swarm.y + swarm.height / 2 - swarm.previous_y) * blend
+
+    visible = ((left > -swarm.width) & (left < camera.width) &
+               (top > -swarm.height) & (top < camera.height))
+
+    squashed_image = clip_frames[ENEMY_SQUASHED][0]
+    walk_left_frames = clip_frames[ENEMY_WALK_LEFT]
+    walk_right_frames = clip_frames[ENEMY_WALK_RIGHT]
+    for i in visible.nonzero()[0]:
+        if swarm.is_squashed[i]:
+            if swarm.squashed_timer[i] <= 0:
+                continue
+            image = squashed_image
+        elif swarm.vx[i] < 0:
+            image = walk_left_frames[swarm.current_frame_index[i]]
         else:
-            if (self.vx < 0 and self.left <= self.movement_start) or \
-               (self.vx > 0 and self.right >= self.movement_end):
-                self.vx *= -1
-
-        if self.image_loaded_successfully and not self.is_squashed:
-            frames_to_use = []
-            if self.vx > 0:
-                frames_to_use = self.walk_right_frames
-            elif self.vx < 0:
-                frames_to_use = self.walk_left_frames
-
-            if frames_to_use:
-                if self.animation_timer >= self.animation_speed:
-                    self.animation_timer = 0
-                    self.current_frame_index = (self.current_frame_index + 1) % len(frames_to_use)
-                    self.image = frames_to_use[self.current_frame_index]
-                elif self.image not in frames_to_use:
-                    self.image = frames_to_use[self.current_frame_index]
-
-        self.on_ground = False
-        for platform_data in PLATFORMS:
-            platform_rect = platform_data['rect']
-            if self.colliderect(platform_rect) and \
-               self.bottom <= platform_rect.top + 5 and \
-               self.bottom >= platform_rect.top - 5:
-                self.bottom = platform_rect.top
-                self.on_ground = True
-                break
-        
-        if not self.on_ground:
-            self.y += 150 * dt
-            if self.top > HEIGHT:
-                self.is_squashed = True
-                self.squashed_timer = 0
-
-    def squash(self):
-        self.is_squashed = True
-        self.image = self.squashed_frame
-        self.squashed_timer = self.SQUASH_DURATION
-        if is_sound_on:
-            sounds.squash_sound.play()
-
-
-class Flag(Actor):
-    def __init__(self, pos):
-        try:
-            super().__init__('flag_0')
-            self.image_loaded_successfully = True
-        except Exception:
-            super().__init__('blank')
-            self.width = 80
-            self.height = 80
-            self.image_loaded_successfully = False
-        
-        self.pos = pos
-        self.collected = False
-
-        self.flag_frames = ["flag_0", "flag_1"]
-        self.current_frame_index = 0
-        self.animation_timer = 0
-        self.animation_speed = 0.3
-
-    def update(self, dt):
-        if not self.collected and self.image_loaded_successfully:
-            self.animation_timer += dt
-            if self.animation_timer >= self.animation_speed:
-                self.animation_timer = 0
-                self.current_frame_index = (self.current_frame_index + 1) % len(self.flag_frames)
-                self.image = self.flag_frames[self.current_frame_index]
-
-    def collect(self):
-        self.collected = True
+            image = walk_right_frames[swarm.current_frame_index[i]]
+        queue_sprite(image, float(left[i]), float(top[i]),
+                     swarm.width, swarm.height, DEBUG_MISSING_IMAGE_COLOR_ENEMY)
+
+def queue_text(text, center, fontsize, color):
+    surface = get_text_surface(text, fontsize, color)
+    queue_sprite(surface, int(round(center[0] - surface.get_width() / 2)), int(round(center[1] - surface.get_height() / 2)),
+                 surface.get_width(), surface.get_height(), None)
+
+# --- Sprite Rendering ---
+# Everything drawn over the static layer is queued for the frame as
+# (image, position, bounds, color for a missing image) and blitted in order by
+# render_sprites(). Bounds are padded by a pixel to cover fractional positions.
+frame_sprites = []
+
+def queue_sprite(image, left, top, width, height, missing_image_color):
+    frame_sprites.append((image, (left, top), pygame.Rect(left, top, width, height).inflate(2, 2), missing_image_color))
+
+def render_sprites(target, sprites):
+    blit_sequence = []
+    for image, position, bounds, missing_image_color in sprites:
+        if image is not None:
+            blit_sequence.append((image, position))
+            continue
+        target.blits(blit_sequence, doreturn=False)
+        perf_monitor.count('blits', len(blit_sequence))
+        blit_sequence = []
+        target.fill(missing_image_color, bounds.inflate(-2, -2))
+    target.blits(blit_sequence, doreturn=False)
+    perf_monitor.count('blits', len(blit_sequence))
+
+def draw_scene_background():
+    if world.width < camera.width or world.height < camera.height:
+        screen.fill(BACKGROUND_COLOR)
+    STATIC_LAYER.draw(screen.surface, camera)
+
+# --- Dirty Rectangle Rendering ---
+# With DIRTY_RECT_RENDERING on, a frame whose camera, state and static layer match the
+# previous one only repaints the areas where a queued sprite appeared, disappeared or
+# changed: the static layer is restored there under a clip and the sprites overlapping it
+# are drawn again. get_dirty_rects() hands those areas to game_loop so only they are sent
+# to the display; any other frame is drawn and flipped whole.
+DIRTY_RECT_RENDERING = False
+_previous_sprites = None
+_previous_frame_key = None
+presented_rects = None
+
+def _sprite_key(sprite):
+    image, position, bounds, missing_image_color = sprite
+    return (image, position, bounds.size, missing_image_color)
+
+def find_dirty_rects(previous_sprites, sprites):
+    previous_keys = {_sprite_key(sprite) for sprite in previous_sprites}
+    current_keys = {_sprite_key(sprite) for sprite in sprites}
+    changed = ([sprite[2] for sprite in previous_sprites if _sprite_key(sprite) not in current_keys] +
+               [sprite[2] for sprite in sprites if _sprite_key(sprite) not in previous_keys])
+
+    # Overlapping areas are merged so nothing is restored and redrawn twice.
+    screen_rect = screen.surface.get_rect()
+    merged = []
+    for rect in changed:
+        rect = rect.clip(screen_rect)
+        if not rect.width or not rect.height:
+            continue
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect = rect.union(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
+def render_dirty_rects(dirty_rects, sprites):
+    target = screen.surface
+    for rect in dirty_rects:
+        target.set_clip(rect)
+        draw_scene_background()
+        render_sprites(target, [sprite for sprite in sprites if sprite[2].colliderect(rect)])
+    target.set_clip(None)
+
+def get_dirty_rects():
+    return presented_rects
+
+# --- Frame Pacing ---
+# Frame rate cap per game state, read by game_loop each frame. In LOW_POWER_MODE, screens
+# that cannot change on their own (the menu once assets are loaded, the frozen won/lost
+# scene) are drawn once and then only redrawn on input, with the loop asleep in between.
+FRAME_RATE_CAPS = {
+    GAME_STATE_MAIN_MENU: 10,
+    GAME_STATE_WON: 10,
+    GAME_STATE_GAME_OVER: 10,
+}
+LOW_POWER_MODE = True
+_drawn_frame_state = None
+
+def _frame_state():
+    return (current_game_state, is_sound_on, preloader.done)
+
+def get_frame_rate():
+    return FRAME_RATE_CAPS.get(current_game_state, game_loop.FRAME_RATE)
+
+def is_frame_static():
+    if not LOW_POWER_MODE or perf_monitor.enabled:
+        return False
+    if current_game_state == GAME_STATE_MAIN_MENU:
+        still = preloader.done
+    else:
+        still = current_game_state in [GAME_STATE_WON, GAME_STATE_GAME_OVER]
+    # The first frame of a state (or after the sound toggle or loading) is always drawn.
+    return still and _drawn_frame_state == _frame_state()
+
+# --- Performance Overlay ---
+# F3 switches perf_monitor on and shows its numbers over the game; F4 writes the frames it
+# has recorded to PERF_CSV_FILE. The same data is available from perf_monitor.summary().
+# Recording alone (as benchmark.py --phases does) draws nothing: the overlay is only
+# shown while perf_overlay_visible is set.
+PERF_CSV_FILE = 'perf_log.csv'
+PERF_OVERLAY_FRAMES = 60
+PERF_GRAPH_FRAMES = 180
+PERF_GRAPH_HEIGHT = 60
+PERF_GRAPH_MS = 33.3 # frame time at the top of the graph
+PERF_PANEL_COLOR = (20, 20, 30)
+PERF_GRAPH_COLOR = (120, 220, 120)
+PERF_GRAPH_SLOW_COLOR = (240, 90, 60)
+PERF_TARGET_FRAME_MS = 1000 / 60
+perf_overlay_visible = False
+
+def draw_perf_overlay():
+    summary = perf_monitor.summary(PERF_OVERLAY_FRAMES)
+    lines = [f"FPS {perf_monitor.fps():.0f}   frame {summary['frame_ms']:.2f} ms (max {summary['max_frame_ms']:.2f})   work {summary['work_ms']:.2f} ms"]
+    for name, value in sorted(summary['phases_ms'].items()):
+        lines.append(f"{name}: {value:.3f} ms")
+    for name, value in sorted(summary['counters'].items()):
+        lines.append(f"{name}: {value:.1f}/frame")
+
+    panel = pygame.Rect(8, 8, 420, 24 + 18 * len(lines) + PERF_GRAPH_HEIGHT)
+    screen.draw.filled_rect(panel, PERF_PANEL_COLOR)
+    for row, line in enumerate(lines):
+        screen.draw.text(line, topleft=(panel.left + 8, panel.top + 6 + 18 * row), fontsize=20, color=WHITE)
+
+    # Frame-time history, newest on the right; frames over budget are drawn in red.
+    graph_bottom = panel.bottom - 8
+    history = list(perf_monitor.history)[-PERF_GRAPH_FRAMES:]
+    for column, frame in enumerate(history):
+        frame_ms = frame.frame_time * 1000
+        bar_height = min(frame_ms / PERF_GRAPH_MS, 1.0) * PERF_GRAPH_HEIGHT
+        color = PERF_GRAPH_SLOW_COLOR if frame_ms > PERF_TARGET_FRAME_MS * 1.5 else PERF_GRAPH_COLOR
+        x = panel.left + 8 + column * 2
+        screen.draw.line((x, graph_bottom), (x, graph_bottom - bar_height), color)
+
+# --- Input ---
+def read_input():
+    return InputState(
+        left=bool(keyboard.left or keyboard.a),
+        right=bool(keyboard.right or keyboard.d),
+        jump=bool(keyboard.space)
+    )
 
 # --- Global Game Instances ---
-player = None
-ENEMIES = []
-PLATFORMS = []
-flag = None
+# .json levels are loaded whole; packed .ppk levels stream their chunks in around the player.
+# With LEVEL_SEED set, the level played is the one level_generator.py builds from that
+# seed: generated the first time, then read back from its cache.
+LEVEL_FILE = DEFAULT_LEVEL_FILE
+LEVEL_SEED = None
+if LEVEL_SEED is not None:
+    LEVEL_FILE = ensure_level(LEVEL_SEED)
+level = None
+world = None
+
+# --- Checkpoints ---
+# Levels that support snapshots are restarted by rolling their World back to the snapshot
+# taken when they were loaded, instead of loading them again. While playing, a checkpoint
+# is also taken every CHECKPOINT_INTERVAL seconds, whenever the player is on the ground.
+# After a game over, 'C' resumes from the newest checkpoint taken at least
+# CHECKPOINT_MIN_AGE seconds before the player lost.
+CHECKPOINT_INTERVAL = 5.0
+CHECKPOINT_MIN_AGE = 1.0
+MAX_CHECKPOINTS = 3
+level_start_snapshot = None
+loaded_level_file = None
+checkpoints = deque(maxlen=MAX_CHECKPOINTS)
 
 def initialize_game_elements():
-    global player, ENEMIES, PLATFORMS, flag
-
-    # Redefine platforms to ensure trampoline state is reset
-    PLATFORMS = [
-        {'rect': pygame.Rect(0, GROUND_TOP_Y, WIDTH, 50), 'type': 'ground'},
-        {'rect': pygame.Rect(150, HEIGHT - 380, 256, 50), 'type': 'floating'},
-        {'rect': pygame.Rect(WIDTH - 256 - 110, HEIGHT - 290, 256, 50), 'type': 'floating'},
-        {'rect': pygame.Rect(WIDTH // 2 - 192, HEIGHT - 560, 384, 50), 'type': 'floating'},
-        {'rect': pygame.Rect(30, GROUND_TOP_Y - 50, 60, 50), 'type': 'trampoline', 'animation_timer': 0.0}
-    ]
-
-    player = Player()
-
-    ENEMIES = [
-        Enemy(
-            start_pos=(200, GROUND_TOP_Y),
-            movement_range=(100, WIDTH - 100)
-        ),
-        Enemy(
-            start_pos=(PLATFORMS[1]['rect'].x + PLATFORMS[1]['rect'].width // 2, PLATFORMS[1]['rect'].top),
-            movement_range=(PLATFORMS[1]['rect'].left, PLATFORMS[1]['rect'].right),
-            platform_rect=PLATFORMS[1]['rect']
-        ),
-        Enemy(
-            start_pos=(PLATFORMS[3]['rect'].x + PLATFORMS[3]['rect'].width // 2, PLATFORMS[3]['rect'].top),
-            movement_range=(PLATFORMS[3]['rect'].left, PLATFORMS[3]['rect'].right),
-            platform_rect=PLATFORMS[3]['rect']
-        )
-    ]
-
-    flag_platform = PLATFORMS[2]['rect']
-    flag = Flag((flag_platform.centerx, flag_platform.top - 30))
+    global level, world, STATIC_LAYER, clip_frames, level_start_snapshot, loaded_level_file
+
+    checkpoints.clear()
+    if level_start_snapshot is not None and loaded_level_file == LEVEL_FILE:
+        world.restore(level_start_snapshot)
+    else:
+        if level is not None:
+            level.close()
+        preloader.finish()
+        clip_frames = resolve_clips(get_image_asset)
+        level = load_level(LEVEL_FILE, level_data=preloaded_levels.get(LEVEL_FILE),
+                           tick_rate=PHYSICS_TICK_RATE, max_steps_per_frame=MAX_PHYSICS_STEPS_PER_FRAME)
+        world = level.world
+        STATIC_LAYER = StaticLayer(world)
+        loaded_level_file = LEVEL_FILE
+        level_start_snapshot = world.snapshot() if level.supports_snapshots else None
+    if level_start_snapshot is not None:
+        checkpoints.append(level_start_snapshot)
+    update_camera()
+    start_recording()
+
+def take_checkpoint():
+    last_ticks = checkpoints[-1].ticks if checkpoints else 0
+    if world.player.on_ground and world.ticks - last_ticks >= CHECKPOINT_INTERVAL * world.tick_rate:
+        checkpoints.append(world.snapshot())
+
+def get_resume_checkpoint():
+    for checkpoint in reversed(checkpoints):
+        if world.ticks - checkpoint.ticks >= CHECKPOINT_MIN_AGE * world.tick_rate:
+            return checkpoint
+    return checkpoints[0] if checkpoints else None
+
+def resume_from_checkpoint(checkpoint):
+    global current_game_state
+
+    # Later checkpoints led to this game over, so they are dropped.
+    while checkpoints[-1] is not checkpoint:
+        checkpoints.pop()
+    world.restore(checkpoint)
+    current_game_state = GAME_STATE_IN_GAME
+    update_camera()
+    start_recording(checkpoint)
+    sound_mixer.play_music("game_music")
+
+# --- Input Recording ---
+# With RECORD_INPUT on, every level played is saved to REPLAY_DIRECTORY when it ends, for
+# replay.py to run again headless.
+RECORD_INPUT = False
+recorder = None
+
+def start_recording(checkpoint=None):
+    # Sessions resumed from a checkpoint save it with the recording, so replay.py can
+    # start from the same moment.
+    global recorder
+    recorder = None
+    if RECORD_INPUT:
+        recorder = InputRecorder(LEVEL_FILE, PHYSICS_TICK_RATE, MAX_PHYSICS_STEPS_PER_FRAME, FIXED_TIMESTEP_ENABLED,
+                                 start_snapshot=checkpoint if checkpoint is not level_start_snapshot else None)
+
+def finish_recording():
+    global recorder
+    if recorder is not None:
+        recorder.save(new_replay_path(REPLAY_DIRECTORY), world)
+        recorder = None
+
+def update_camera():
+    offset_x, offset_y = get_interpolation_offset(world.player)
+    camera.follow(world.player.x + offset_x, world.player.y + offset_y, world.width, world.height)
+
+# --- Asset Preloading ---
+# While the menu is up, a thread pool reads and decodes the sprite atlas, any sprite
+# outside it, the sound effects and the level file. Finished work is handed back to the
+# main thread by poll() (called from update()), where surfaces get convert_alpha(), so
+# starting a level never waits on the disk. A failed load is left to the lazy loaders.
+PRELOAD_WORKERS = 4
+PRELOAD_BAR_COLOR = (255, 255, 255)
+preloaded_levels = {}
+
+class AssetPreloader:
+    def __init__(self, workers=PRELOAD_WORKERS):
+        self.workers = workers
+        self.executor = None
+        self.pending = []
+        self.total = 0
+        self.completed = 0
+
+    def submit(self, load, on_done, *args):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='preload')
+        self.pending.append((self.executor.submit(load, *args), on_done))
+        self.total += 1
+
+    @property
+    def done(self):
+        return not self.pending
+
+    @property
+    def progress(self):
+        return self.completed / self.total if self.total else 1.0
+
+    def poll(self):
+        # Runs the main-thread half of every finished task; those may submit more work.
+        finished = [entry for entry in self.pending if entry[0].done()]
+        for entry in finished:
+            self.pending.remove(entry)
+            future, on_done = entry
+            self.completed += 1
+            if future.exception() is None:
+                on_done(future.result())
+        if not self.pending and self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    def finish(self):
+        while self.pending:
+            wait_for_futures([future for future, _ in self.pending])
+            self.poll()
+
+def _on_atlas_read(atlas_data):
+    if _atlas is None:
+        install_atlas(atlas_data)
+    for image_name in SPRITE_NAMES:
+        if image_name not in _atlas['sprites'] and image_name not in _images_loaded:
+            preloader.submit(read_image_file, lambda image, name=image_name: install_image(name, image), image_name)
+
+def _on_level_read(level_data, path):
+    preloaded_levels[path] = level_data
+
+def start_preloading():
+    preloader.submit(read_atlas, _on_atlas_read)
+    for sound_name in SOUND_NAMES:
+        preloader.submit(sounds.load, lambda sound, name=sound_name: sound_mixer.add_sound(name, sound), sound_name)
+    for music_name in MUSIC_NAMES:
+        preloader.submit(read_music_file, lambda music_data, name=music_name: sound_mixer.add_music(name, music_data), music_name)
+    if LEVEL_FILE.endswith('.json'):
+        preloader.submit(read_level, lambda level_data, path=LEVEL_FILE: _on_level_read(level_data, path), LEVEL_FILE)
+
+def draw_preload_progress():
+    bar = pygame.Rect(exit_button.left, exit_button.bottom + 40, exit_button.width, 8)
+    screen.draw.rect(bar, PRELOAD_BAR_COLOR)
+    screen.draw.filled_rect(pygame.Rect(bar.left, bar.top, int(bar.width * preloader.progress), bar.height), PRELOAD_BAR_COLOR)
+    screen.draw.text(f"Carregando... {int(preloader.progress * 100)}%", midtop=(bar.centerx, bar.bottom + 6), fontsize=24, color=WHITE)
+
+preloader = AssetPreloader()
 
 # --- Main PgZero Functions ---
 
 def draw():
-    if current_game_state == GAME_STATE_MAIN_MENU:
-        screen.fill(SKY_BLUE)
-        screen.draw.text("Pixel Peak", center=(WIDTH / 2, 150), fontsize=70, color=STEEL_BLUE, owidth=1.5, ocolor=WHITE)
+    global presented_rects, _previous_sprites, _previous_frame_key, _drawn_frame_state
+
+    if current_game_state not in [GAME_STATE_IN_GAME, GAME_STATE_WON, GAME_STATE_GAME_OVER]:
+        presented_rects = None
+        _previous_sprites = None
 
-        draw_rounded_rect(start_button, STEEL_BLUE, BUTTON_RADIUS)
-        screen.draw.text("Jogar", center=start_button.center, fontsize=35, color=WHITE)
+    if current_game_state == GAME_STATE_MAIN_MENU:
+        with perf_monitor.phase('draw_text'):
+            screen.fill(SKY_BLUE)
+            draw_cached_text("Pixel Peak", (WIDTH / 2, 150), 70, STEEL_BLUE, owidth=1.5, ocolor=WHITE)
 
-        draw_rounded_rect(sound_button, STEEL_BLUE, BUTTON_RADIUS)
-        sound_text = "Músicas e sons: ON" if is_sound_on else "Músicas e sons: OFF"
-        screen.draw.text(sound_text, center=sound_button.center, fontsize=35, color=WHITE)
+            draw_button(start_button, "Jogar")
+            sound_text = "Músicas e sons: ON" if is_sound_on else "Músicas e sons: OFF"
+            draw_button(sound_button, sound_text)
+            draw_button(exit_button, "Sair")
 
-        draw_rounded_rect(exit_button, STEEL_BLUE, BUTTON_RADIUS)
-        screen.draw.text("Sair", center=exit_button.center, fontsize=35, color=WHITE)
+            if not preloader.done:
+                draw_preload_progress()
 
     elif current_game_state in [GAME_STATE_IN_GAME, GAME_STATE_WON, GAME_STATE_GAME_OVER]:
-        screen.fill(BACKGROUND_COLOR)
+        update_camera()
 
-        # Draw Platforms
-        for platform_data in PLATFORMS:
-            platform_rect = platform_data['rect']
-            platform_type = platform_data['type']
-
-            if platform_type == 'ground':
-                ground_image = get_image_asset(GROUND_TILE_NAME)
-                if ground_image is None:
-                    screen.draw.filled_rect(platform_rect, DEBUG_MISSING_IMAGE_COLOR_PLATFORM)
-                    continue
-
-                tile_width = ground_image.get_width()
-                scaled_ground_image = ground_image
-                if ground_image.get_height() != platform_rect.height:
-                    scaled_ground_image = pygame.transform.scale(ground_image, (tile_width, platform_rect.height))
-
-                for x_offset in range(0, platform_rect.width, tile_width):
-                    screen.blit(scaled_ground_image, (platform_rect.x + x_offset, platform_rect.y))
-
-            elif platform_type == 'floating':
-                left_edge_name = f"{FLOATING_TILE_PREFIX}_left"
-                middle_name = f"{FLOATING_TILE_PREFIX}_middle"
-                right_edge_name = f"{FLOATING_TILE_PREFIX}_right"
-
-                img_left_edge = get_image_asset(left_edge_name)
-                img_middle = get_image_asset(middle_name)
-                img_right_edge = get_image_asset(right_edge_name)
-
-                if img_middle is None:
-                    screen.draw.filled_rect(platform_rect, DEBUG_MISSING_IMAGE_COLOR_PLATFORM)
-                    continue
-
-                original_tile_width = img_middle.get_width()
-                original_tile_height = img_middle.get_height()
-                target_tile_height = platform_rect.height
-
-                scaled_img_left_edge = img_left_edge
-                scaled_img_middle = img_middle
-                scaled_img_right_edge = img_right_edge
-
-                if original_tile_height != target_tile_height:
-                    if img_left_edge: scaled_img_left_edge = pygame.transform.scale(img_left_edge, (original_tile_width, target_tile_height))
-                    if img_middle: scaled_img_middle = pygame.transform.scale(img_middle, (original_tile_width, target_tile_height))
-                    if img_right_edge: scaled_img_right_edge = pygame.transform.scale(img_right_edge, (original_tile_width, target_tile_height))
-
-                if scaled_img_left_edge:
-                    screen.blit(scaled_img_left_edge, (platform_rect.x, platform_rect.y))
-                else:
-                    screen.draw.filled_rect(pygame.Rect(platform_rect.x, platform_rect.y, original_tile_width, target_tile_height), DEBUG_MISSING_IMAGE_COLOR_PLATFORM)
-
-                middle_tiles_width = platform_rect.width - (2 * original_tile_width)
-                if middle_tiles_width > 0:
-                    for x_offset in range(original_tile_width, platform_rect.width - original_tile_width, original_tile_width):
-                        if scaled_img_middle:
-                            screen.blit(scaled_img_middle, (platform_rect.x + x_offset, platform_rect.y))
-
-                if scaled_img_right_edge:
-                    screen.blit(scaled_img_right_edge, (platform_rect.x + platform_rect.width - original_tile_width, platform_rect.y))
-                else:
-                    screen.draw.filled_rect(pygame.Rect(platform_rect.x + platform_rect.y, original_tile_width, target_tile_height), DEBUG_MISSING_IMAGE_COLOR_PLATFORM)
-
-            elif platform_type == 'trampoline':
-                current_trampoline_image_name = TRAMPOLINE_IDLE_NAME
-                if platform_data['animation_timer'] > 0:
-                    current_trampoline_image_name = TRAMPOLINE_ACTIVE_NAME
-                trampoline_image = get_image_asset(current_trampoline_image_name)
-
-                if trampoline_image is None:
-                    screen.draw.filled_rect(platform_rect, DEBUG_MISSING_IMAGE_COLOR_PLATFORM)
-                else:
-                    scaled_trampoline_image = pygame.transform.scale(trampoline_image, (platform_rect.width, platform_rect.height))
-                    screen.blit(scaled_trampoline_image, platform_rect.topleft)
+        frame_sprites.clear()
+
+        # Draw Trampolines
+        for platform_data in world.trampolines:
+            platform_rect = platform_data.rect
+            if camera.is_visible(platform_rect.x, platform_rect.y, platform_rect.width, platform_rect.height):
+                queue_trampoline(platform_data)
 
         # Draw Flag
+        flag = world.flag
         if flag and not flag.collected:
-            if flag.image_loaded_successfully:
-                flag.draw()
-            else:
-                screen.draw.filled_rect(flag.rect, DEBUG_MISSING_IMAGE_COLOR_FLAG)
+            queue_body(flag, get_animation_frame(flag.animation), DEBUG_MISSING_IMAGE_COLOR_FLAG)
 
         # Draw Enemies
-        for enemy in ENEMIES:
-            if not enemy.is_squashed or enemy.squashed_timer > 0:
-                if enemy.image_loaded_successfully:
-                    enemy.draw()
-                else:
-                    screen.draw.filled_rect(enemy.rect, DEBUG_MISSING_IMAGE_COLOR_ENEMY)
+        if world.swarm is not None:
+            queue_enemy_swarm(world.swarm)
+        else:
+            visible_enemies = world.enemy_grid.query(camera.get_region(ENEMY_DRAW_MARGIN))
+            for enemy in visible_enemies:
+                if not enemy.is_squashed or enemy.squashed_timer > 0:
+                    queue_body(enemy, get_animation_frame(enemy.animation), DEBUG_MISSING_IMAGE_COLOR_ENEMY)
 
         # Draw Player
-        if player:
-            if player.image_loaded_successfully:
-                player.draw()
-            else:
-                screen.draw.filled_rect(player.rect, DEBUG_MISSING_IMAGE_COLOR_PLAYER)
+        queue_body(world.player, get_animation_frame(world.player.animation), DEBUG_MISSING_IMAGE_COLOR_PLAYER)
 
         # Draw final game state messages (won/lost)
         if current_game_state == GAME_STATE_WON:
-            screen.draw.text("VOCÊ VENCEU!", center=(WIDTH // 2, HEIGHT // 2), color="green", fontsize=100)
-            screen.draw.text("Aperte 'R' para voltar ao MENU ou 'ESC' para fechar o jogo", center=(WIDTH // 2, HEIGHT // 2 + 80), color="white", fontsize=30)
+            queue_text("VOCÊ VENCEU!", (WIDTH // 2, HEIGHT // 2), 100, "green")
+            queue_text("Aperte 'R' para voltar ao MENU ou 'ESC' para fechar o jogo", (WIDTH // 2, HEIGHT // 2 + 80), 30, "white")
         elif current_game_state == GAME_STATE_GAME_OVER:
-            screen.draw.text("FIM DE JOGO!", center=(WIDTH // 2, HEIGHT // 2), color="red", fontsize=100)
-            screen.draw.text("Aperte 'R' para voltar ao MENU ou 'ESC' para fechar o jogo", center=(WIDTH // 2, HEIGHT // 2 + 80), color="white", fontsize=30)
+            queue_text("FIM DE JOGO!", (WIDTH // 2, HEIGHT // 2), 100, "red")
+            queue_text("Aperte 'R' para voltar ao MENU ou 'ESC' para fechar o jogo", (WIDTH // 2, HEIGHT // 2 + 80), 30, "white")
+            if checkpoints:
+                queue_text("Aperte 'C' para continuar do último checkpoint", (WIDTH // 2, HEIGHT // 2 + 120), 30, "white")
+
+        # Static geometry is baked into STATIC_LAYER; the queued sprites are drawn on top.
+        # The overlay is part of the key so the frame after it is hidden is drawn in full.
+        frame_key = (current_game_state, camera.left, camera.top, STATIC_LAYER, bool(world.changed_areas),
+                     perf_overlay_visible)
+        if (DIRTY_RECT_RENDERING and not perf_overlay_visible and
+                _previous_sprites is not None and frame_key == _previous_frame_key):
+            with perf_monitor.phase('draw_dirty_rects'):
+                presented_rects = find_dirty_rects(_previous_sprites, frame_sprites)
+                render_dirty_rects(presented_rects, frame_sprites)
+        else:
+            presented_rects = None
+            with perf_monitor.phase('draw_platforms'):
+                draw_scene_background()
+            with perf_monitor.phase('draw_actors'):
+                render_sprites(screen.surface, frame_sprites)
+        _previous_sprites = list(frame_sprites)
+        _previous_frame_key = frame_key
 
     elif current_game_state == GAME_STATE_EXIT:
         pass
 
+    if perf_overlay_visible:
+        with perf_monitor.phase('overlay'):
+            draw_perf_overlay()
+    perf_monitor.end_frame()
+    _drawn_frame_state = _frame_state()
+
+
+def handle_world_events(events):
+    global current_game_state
+
+    for event in events:
+        if event == EVENT_ENEMY_SQUASHED:
+            sound_mixer.play_sound("squash_sound")
+        elif event == EVENT_PLAYER_HIT:
+            current_game_state = GAME_STATE_GAME_OVER
+            sound_mixer.play_sound("game_over_sound")
+        elif event == EVENT_PLAYER_FELL:
+            current_game_state = GAME_STATE_GAME_OVER
+            sound_mixer.stop_music()
+            sound_mixer.play_sound("game_over_sound")
+        elif event == EVENT_FLAG_COLLECTED:
+            current_game_state = GAME_STATE_WON
+            sound_mixer.stop_music()
+            sound_mixer.play_sound("win_sound")
 
 def update(dt):
     global current_game_state, is_sound_on
 
+    perf_monitor.begin_frame()
+    if not preloader.done:
+        preloader.poll()
+
     if current_game_state == GAME_STATE_MAIN_MENU:
         pass
     elif current_game_state == GAME_STATE_IN_GAME:
-        if player:
-            player.update(dt)
-
-        if flag and not flag.collected:
-            flag.update(dt)
-
-        for enemy in list(ENEMIES):
-            enemy.update(dt)
-
-        for platform_data in PLATFORMS:
-            if platform_data['type'] == 'trampoline':
-                if platform_data['animation_timer'] > 0:
-                    platform_data['animation_timer'] -= dt
-                    if platform_data['animation_timer'] < 0:
-                        platform_data['animation_timer'] = 0
+        world.update_region = camera.get_region(UPDATE_CULL_MARGIN) if CULL_OFFSCREEN_UPDATES else None
+        with perf_monitor.phase('input'):
+            inputs = read_input()
+        if FIXED_TIMESTEP_ENABLED:
+            events = world.advance(dt, inputs)
+        else:
+            events = world.step(dt, inputs)
+        if recorder is not None:
+            recorder.record_frame(dt, inputs, world.update_region)
+        handle_world_events(events)
+        level.stream(world.player.x)
+        if current_game_state != GAME_STATE_IN_GAME:
+            finish_recording()
+        elif level_start_snapshot is not None:
+            take_checkpoint()
     elif current_game_state in [GAME_STATE_WON, GAME_STATE_GAME_OVER]:
         pass
     elif current_game_state == GAME_STATE_EXIT:
         exit()
 
+    # Sounds queued by this frame's events and input, played once the simulation is done.
+    sound_mixer.flush()
+
 
 def on_mouse_down(pos):
     global current_game_state, is_sound_on
@@ -578,47 +915,41 @@ def on_mouse_down(pos):
         if start_button.collidepoint(pos):
             current_game_state = GAME_STATE_IN_GAME
             initialize_game_elements()
-            if is_sound_on:
-                music.stop()
-                music.play("game_music")
-                music.set_volume(MUSIC_VOLUME) # Definindo o volume da música do jogo
+            sound_mixer.play_music("game_music")
         elif sound_button.collidepoint(pos):
             is_sound_on = not is_sound_on
-            if is_sound_on:
-                music.set_volume(MUSIC_VOLUME) # Ajuste para o volume desejado quando o som é LIGADO
-                if current_game_state == GAME_STATE_MAIN_MENU:
-                    music.play("menu_music")
-                    
-                elif current_game_state == GAME_STATE_IN_GAME and not music.is_playing("game_music"):
-                    music.play("game_music")
-            else:
-                music.set_volume(0) # Permanece 0 para MUTAR
+            sound_mixer.set_enabled(is_sound_on)
         elif exit_button.collidepoint(pos):
             current_game_state = GAME_STATE_EXIT
 
 def on_key_down(key):
-    global current_game_state
+    global current_game_state, perf_overlay_visible
+
+    if key == keys.F3:
+        perf_overlay_visible = perf_monitor.toggle()
+        return
+    if key == keys.F4 and perf_monitor.enabled:
+        perf_monitor.dump_csv(PERF_CSV_FILE)
+        return
 
     if current_game_state in [GAME_STATE_WON, GAME_STATE_GAME_OVER]:
         if key == keys.R:
             current_game_state = GAME_STATE_MAIN_MENU
-            if is_sound_on:
-                music.stop()
-                music.play("menu_music")
-                music.set_volume(MUSIC_VOLUME) # Ajuste aqui
+            sound_mixer.play_music("menu_music")
         elif key == keys.ESCAPE:
             current_game_state = GAME_STATE_EXIT
+        elif key == keys.C and current_game_state == GAME_STATE_GAME_OVER and checkpoints:
+            resume_from_checkpoint(get_resume_checkpoint())
     elif current_game_state == GAME_STATE_IN_GAME:
+        if recorder is not None:
+            recorder.record_key(key.name)
         if key == keys.ESCAPE:
             current_game_state = GAME_STATE_MAIN_MENU
-            if is_sound_on:
-                music.stop()
-                music.play("menu_music")
-                music.set_volume(MUSIC_VOLUME) # Ajuste aqui
+            finish_recording()
+            sound_mixer.play_music("menu_music")
             
 # --- Initialization ---
-if is_sound_on:
-    music.play("menu_music")
-    music.set_volume(MUSIC_VOLUME) # Adicione ou ajuste esta linha para o volume desejado (ex: 60%)
+start_preloading()
+sound_mixer.play_music("menu_music")
 
-pgzrun.go()
\ No newline at end of file
+game_loop.go()
\ No newline at end of file
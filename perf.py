@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+# Frame profiler for Pixel Peak.
+#
+# PerfMonitor times named phases (input, player physics, enemy updates, drawing...) and
+# counts events (collision tests, blits, cache misses) for each frame, and keeps the
+# last PERF_HISTORY_FRAMES frames in a ring buffer that the debug overlay reads and
+# dump_csv() writes out. It is plain Python so world.py can report into it too. While
+# disabled every call returns straight away.
+import csv
+import time
+from collections import deque
+
+PERF_HISTORY_FRAMES = 600
+
+
+class _PhaseTimer:
+    # Reusable context manager that adds its elapsed time to one phase of the frame.
+    __slots__ = ('monitor', 'name', 'start')
+
+    def __init__(self, monitor, name):
+        self.monitor = monitor
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        phase_times = self.monitor.phase_times
+        phase_times[self.name] = phase_times.get(self.name, 0.0) + time.perf_counter() - self.start
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+_NULL_TIMER = _NullTimer()
+
+
+class PerfFrame:
+    __slots__ = ('frame_time', 'work_time', 'phases', 'counters')
+
+    def __init__(self, frame_time, work_time, phases, counters):
+        self.frame_time = frame_time   # seconds since the previous frame began
+        self.work_time = work_time     # seconds from begin_frame() to end_frame()
+        self.phases = phases
+        self.counters = counters
+
+
+class PerfMonitor:
+    def __init__(self, history_frames=PERF_HISTORY_FRAMES):
+        self.enabled = False
+        self.history = deque(maxlen=history_frames)
+        self.phase_times = {}
+        self.counters = {}
+        self._timers = {}
+        self._frame_start = None
+        self._previous_frame_start = None
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        self._frame_start = None
+        self._previous_frame_start = None
+
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+        return self.enabled
+
+    def clear(self):
+        self.history.clear()
+
+    # --- Recording ---
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self._previous_frame_start = self._frame_start
+        self._frame_start = time.perf_counter()
+        self.phase_times = {}
+        self.counters = {}
+
+    def end_frame(self):
+        if not self.enabled or self._frame_start is None:
+            return
+        now = time.perf_counter()
+        work_time = now - self._frame_start
+        # The first frame after enabling has no predecessor; its own work time stands in.
+        frame_time = work_time
+        if self._previous_frame_start is not None:
+            frame_time = self._frame_start - self._previous_frame_start
+        self.history.append(PerfFrame(frame_time, work_time, self.phase_times, self.counters))
+
+    def phase(self, name):
+        # with monitor.phase('player'): ...  -- time spent inside is added to the phase,
+        # so a phase entered once per physics tick sums over the frame.
+        if not self.enabled:
+            return _NULL_TIMER
+        timer = self._timers.get(name)
+        if timer is None:
+            timer = self._timers[name] = _PhaseTimer(self, name)
+        return timer
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    # --- Reading ---
+    def fps(self):
+        if not self.history:
+            return 0.0
+        total_time = sum(frame.frame_time for frame in self.history)
+        return len(self.history) / total_time if total_time > 0 else 0.0
+
+    def summary(self, frames=None):
+        # Averages over the last `frames` recorded frames (all of them by default), in
+        # milliseconds for times and per frame for counters.
+        recent = list(self.history)[-frames:] if frames else list(self.history)
+        if not recent:
+            return {'frames': 0, 'frame_ms': 0.0, 'work_ms': 0.0, 'max_frame_ms': 0.0, 'phases_ms': {}, 'counters': {}}
+
+        phases = {}
+        counters = {}
+        for frame in recent:
+            for name, value in frame.phases.items():
+                phases[name] = phases.get(name, 0.0) + value
+            for name, value in frame.counters.items():
+                counters[name] = counters.get(name, 0) + value
+        count = len(recent)
+        return {
+            'frames': count,
+            'frame_ms': sum(frame.frame_time for frame in recent) / count * 1000,
+            'work_ms': sum(frame.work_time for frame in recent) / count * 1000,
+            'max_frame_ms': max(frame.frame_time for frame in recent) * 1000,
+            'phases_ms': {name: value / count * 1000 for name, value in phases.items()},
+            'counters': {name: value / count for name, value in counters.items()},
+        }
+
+    def dump_csv(self, path):
+        # One row per recorded frame; phase columns are in milliseconds.
+        frames = list(self.history)
+        phase_names = sorted({name for frame in frames for name in frame.phases})
+        counter_names = sorted({name for frame in frames for name in frame.counters})
+        with open(path, 'w', newline='', encoding='utf-8') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(['frame', 'frame_ms', 'work_ms'] +
+                            [f'{name}_ms' for name in phase_names] + counter_names)
+            for index, frame in enumerate(frames):
+                writer.writerow([index, round(frame.frame_time * 1000, 4), round(frame.work_time * 1000, 4)] +
+                                [round(frame.phases.get(name, 0.0) * 1000, 4) for name in phase_names] +
+                                [frame.counters.get(name, 0) for name in counter_names])
+        return len(frames)
+
+
+# Shared instance that the game and the simulation report into.
+monitor = PerfMonitor()
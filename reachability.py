@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+# Offline reachability check for Pixel Peak levels.
+#
+# For every platform, the player is placed on it at regular take-off points and flown
+# through a fixed set of jumps and walk-offs (hold left, right or nothing, optionally
+# switching direction mid-air) with the real PlayerBody physics from world.py at the
+# game's tick rate, trampolines included. Where each flight lands becomes an edge of a
+# platform graph; a breadth-first search from the platform the player spawns on then gives
+# the reachable platforms and whether the flag can be touched. Enemies are left out: the
+# question is whether the geometry can be completed at all.
+#
+# Flights are independent, so every (level, platform) pair is one job for a process pool:
+#
+#   python reachability.py levels/*.json
+#   python reachability.py generated/*.json --workers 8 --json reachability.json
+#
+# The exit status is 1 when any level's flag is out of reach, so it can gate CI.
+import argparse
+import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from levels import StreamingLevel, load_level
+from world import (
+    DEFAULT_TICK_RATE, OUTCOME_PLAYING, OUTCOME_WON, PLATFORM_TRAMPOLINE, InputState, PlayerBody, Rect, World
+)
+
+# --- Sampling Settings ---
+TAKEOFF_SPACING = 32            # pixels between take-off points along a platform
+STEER_SWITCH_TIMES = (0.15, 0.3, 0.5)   # seconds into a flight when the held direction may change
+MAX_FLIGHT_TIME = 4.0           # seconds before a flight that never lands is given up
+DIRECTIONS = (-1, 0, 1)
+
+# Loading a packed level with this stream radius brings in every chunk at once.
+ALL_CHUNKS = 1 << 30
+
+class _NoEnemies:
+    # Stands in for the enemy grid, so the player's enemy checks cost nothing per tick.
+    def query(self, bounds):
+        return ()
+
+NO_ENEMIES = _NoEnemies()
+
+# Worker processes keep the levels they have built, keyed by path.
+_worlds = {}
+
+def _make_inputs(direction, jump):
+    return InputState(left=direction < 0, right=direction > 0, jump=jump)
+
+def flight_patterns(tick_rate):
+    # (first direction, tick of the switch, second direction); a switch at tick 0 means
+    # the second direction is held for the whole flight.
+    patterns = [(direction, 0, direction) for direction in DIRECTIONS]
+    for switch_time in STEER_SWITCH_TIMES:
+        switch_tick = round(switch_time * tick_rate)
+        for first in DIRECTIONS:
+            for second in DIRECTIONS:
+                if second != first:
+                    patterns.append((first, switch_tick, second))
+    return patterns
+
+def load_analysis_world(path, tick_rate=DEFAULT_TICK_RATE):
+    # A World holding the whole level's platforms and flag but no enemies.
+    if path.endswith('.ppk'):
+        level = StreamingLevel(path, stream_radius=ALL_CHUNKS, batched_enemies=False)
+    else:
+        level = load_level(path, batched_enemies=False)
+    level.close()
+    source = level.world
+    world = World(list(source.platforms), [], source.flag, player=PlayerBody(source.player.midbottom),
+                  width=source.width, height=source.height, tick_rate=tick_rate, batched_enemies=False)
+    world.enemy_grid = NO_ENEMIES
+    return world
+
+def _get_world(path, tick_rate):
+    world = _worlds.get((path, tick_rate))
+    if world is None:
+        world = _worlds[(path, tick_rate)] = load_analysis_world(path, tick_rate)
+    return world
+
+def _support(world, player):
+    # The platform the player is standing on, if any.
+    below = Rect(player.left, player.bottom - 1, player.width, 2)
+    for platform_data in world.platform_grid.query(below):
+        rect = platform_data.rect
+        if rect.top == player.bottom and rect.left < player.right and player.left < rect.right:
+            return platform_data
+    return None
+
+def _can_still_land(world, player):
+    # Whether a falling player could still land on anything. Falling only gets faster, so
+    # the player drops out of the level within depth / vy seconds and can't steer further
+    # sideways than that allows.
+    depth = world.height + player.height - player.bottom
+    reach = player.speed * depth / player.vy
+    below = Rect(player.left - reach, player.bottom, player.width + 2 * reach, depth)
+    return any(platform_data.rect.top >= player.bottom for platform_data in world.platform_grid.query(below))
+
+def _advance(world, source, flight, inputs_at, end_tick):
+    # Runs a flight on from flight = [tick, trampolines bounced on, flag touched, take-off
+    # bottom], with world.player in its state at that tick, until it ends or gets to
+    # end_tick. Returns (platform landed on or None, trampolines bounced on, whether the
+    # flag was touched) once it has ended, or None while it is still going; flight is
+    # updated in place.
+    player = world.player
+    dt = 1.0 / world.tick_rate
+    tick, bounced, reached_flag, takeoff_bottom = flight
+    while tick < end_tick:
+        falling = player.vy >= 0
+        world.events = []
+        player.update(world, dt, inputs_at(tick))
+        tick += 1
+
+        if world.outcome == OUTCOME_WON:
+            # Touching the flag ends a real game; here the flight goes on so that where it
+            # lands, usually the flag's own platform, still becomes an edge.
+            # PlayerBody.update() returns on the flag before setting on_ground, so whether
+            # the player came down on something is worked out here.
+            reached_flag = True
+            world.outcome = OUTCOME_PLAYING
+            world.flag.collected = False
+            player.on_ground = _support(world, player) is not None
+        elif world.outcome != OUTCOME_PLAYING:
+            return None, bounced, reached_flag
+
+        if falling and player.vy < 0 and tick > 1:
+            # Bounced off a trampoline: the flight takes off again from there.
+            takeoff_bottom = player.bottom
+        elif player.vy > 0 and player.bottom > takeoff_bottom and not _can_still_land(world, player):
+            # Back below its take-off height with no platform left in reach: the rest of
+            # the flight is a fall out of the level.
+            return None, bounced, reached_flag
+
+        if player.on_ground:
+            platform_data = _support(world, player)
+            if platform_data is source:
+                # Back where it started; walking on from here is covered by other flights.
+                return None, bounced, reached_flag
+            if platform_data is None:
+                continue
+            if platform_data.kind == PLATFORM_TRAMPOLINE:
+                if platform_data not in bounced:
+                    bounced.append(platform_data)
+                continue
+            return platform_data, bounced, reached_flag
+    flight[:] = [tick, bounced, reached_flag, takeoff_bottom]
+    return None
+
+def fly_patterns(world, start, source, jump, patterns, max_ticks):
+    # Flies every pattern from one take-off point and returns their results, in order, as
+    # (platform landed on or None, trampolines bounced on, whether the flag was touched).
+    # Patterns with the same first direction are the same flight up to their switch tick,
+    # so the flight holding that direction throughout is paused at each switch tick and
+    # the switching patterns go on from a copy of it.
+    results = {}
+    for first in sorted({pattern[0] for pattern in patterns}):
+        held = _make_inputs(first, False)
+        jumping = _make_inputs(first, True)
+        first_inputs = lambda tick: jumping if jump and tick == 0 else held
+        world.player = PlayerBody(start)
+        world.outcome = OUTCOME_PLAYING
+        flight = [0, [], False, world.player.bottom]
+        paused = {}
+        for switch_tick in sorted({pattern[1] for pattern in patterns if pattern[0] == first and pattern[1] > 0}):
+            result = _advance(world, source, flight, first_inputs, switch_tick)
+            if result is not None:
+                break
+            paused[switch_tick] = (world.player.get_state(), [flight[0], list(flight[1])] + flight[2:])
+        else:
+            result = _advance(world, source, flight, first_inputs, max_ticks) or (None, flight[1], flight[2])
+        results[(first, 0, first)] = result
+        trunk_result = result
+
+        for pattern in patterns:
+            _, switch_tick, second = pattern
+            if pattern[0] != first or switch_tick == 0:
+                continue
+            if switch_tick not in paused:
+                # Ended before the switch, so it is the same flight.
+                results[pattern] = trunk_result
+                continue
+            player_state, flight = paused[switch_tick]
+            world.player = PlayerBody(start)
+            world.player.set_state(player_state)
+            world.outcome = OUTCOME_PLAYING
+            flight = [flight[0], list(flight[1])] + flight[2:]
+            second_inputs = _make_inputs(second, False)
+            results[pattern] = (_advance(world, source, flight, lambda tick: second_inputs, max_ticks) or
+                                (None, flight[1], flight[2]))
+    return [results[pattern] for pattern in patterns]
+
+def fly(world, start, source, jump, pattern, max_ticks):
+    # Runs one flight; see fly_patterns().
+    return fly_patterns(world, start, source, jump, [pattern], max_ticks)[0]
+
+def takeoff_points(world, platform_data):
+    # Centre x positions where the player can stand on the platform without overlapping
+    # anything else; the first and last ones hang over the edges.
+    rect = platform_data.rect
+    half_width = world.player.width / 2
+    first_x = rect.left - half_width + 1
+    last_x = rect.right + half_width - 1
+    count = max(1, int((last_x - first_x) // TAKEOFF_SPACING))
+    points = []
+    for i in range(count + 1):
+        x = first_x + (last_x - first_x) * i / count
+        probe = PlayerBody((x, rect.top))
+        if not any(probe.colliderect(other.rect) for other in world.platform_grid.query(probe)):
+            points.append((x, rect.top))
+    return points
+
+def sample_platform(path, source_index, tick_rate=DEFAULT_TICK_RATE):
+    # Process pool job: every flight from one platform. Returns the platform indices it
+    # lands on, the trampolines used on the way and whether the flag was touched.
+    world = _get_world(path, tick_rate)
+    source = world.platforms[source_index]
+    index_of = {id(platform_data): index for index, platform_data in enumerate(world.platforms)}
+    max_ticks = int(MAX_FLIGHT_TIME * tick_rate)
+    patterns = flight_patterns(tick_rate)
+
+    landings = set()
+    trampolines = set()
+    reached_flag = False
+    if source.kind != PLATFORM_TRAMPOLINE:
+        starts = takeoff_points(world, source)
+        flights = [(start, True, patterns) for start in starts]
+        # Walking off the edges, moving outwards from the first tick.
+        if starts:
+            flights.append((starts[0], False, [pattern for pattern in patterns if pattern[0] < 0]))
+            flights.append((starts[-1], False, [pattern for pattern in patterns if pattern[0] > 0]))
+        results = [result for start, jump, start_patterns in flights
+                   for result in fly_patterns(world, start, source, jump, start_patterns, max_ticks)]
+        for landed, bounced, touched_flag in results:
+            if landed is not None:
+                landings.add(index_of[id(landed)])
+            trampolines.update(index_of[id(platform_data)] for platform_data in bounced)
+            reached_flag = reached_flag or touched_flag
+    return source_index, sorted(landings), sorted(trampolines), reached_flag
+
+def find_spawn_platform(world):
+    # Drops the player from their start position with no input.
+    start = world.player.midbottom
+    landed, _, touched_flag = fly(world, start, None, False, (0, 0, 0), int(MAX_FLIGHT_TIME * world.tick_rate))
+    if landed is None and not touched_flag:
+        # Spawned standing still on a platform: fly() stops there without reporting it.
+        probe = PlayerBody(start)
+        landed = _support(world, probe)
+    return landed, touched_flag
+
+# --- Graph ---
+def build_report(path, world, results, spawn_platform, flag_at_spawn):
+    index_of = {id(platform_data): index for index, platform_data in enumerate(world.platforms)}
+    edges = {index: landings for index, landings, _, _ in results}
+    trampolines_used = {index: used for index, _, used, _ in results}
+    flag_from = {index for index, _, _, reached_flag in results if reached_flag}
+
+    reachable = set()
+    if spawn_platform is not None:
+        spawn_index = index_of[id(spawn_platform)]
+        queue = deque([spawn_index])
+        reachable.add(spawn_index)
+        while queue:
+            index = queue.popleft()
+            for next_index in edges.get(index, []) + trampolines_used.get(index, []):
+                if next_index not in reachable:
+                    reachable.add(next_index)
+                    if world.platforms[next_index].kind != PLATFORM_TRAMPOLINE:
+                        queue.append(next_index)
+
+    return {
+        'level': path,
+        'platforms': len(world.platforms),
+        'spawn_platform': index_of[id(spawn_platform)] if spawn_platform is not None else None,
+        'edges': {str(index): edges[index] for index in sorted(edges)},
+        'trampolines': {str(index): trampolines_used[index] for index in sorted(trampolines_used) if trampolines_used[index]},
+        'reachable': sorted(reachable),
+        'unreachable': sorted(set(range(len(world.platforms))) - reachable),
+        'has_flag': world.flag is not None,
+        'flag_reachable': flag_at_spawn or bool(flag_from & reachable),
+    }
+
+def analyze_levels(paths, workers=None, tick_rate=DEFAULT_TICK_RATE):
+    # Spreads every platform of every level over one process pool and returns a report
+    # per level, in the order given.
+    worlds = {path: load_analysis_world(path, tick_rate) for path in paths}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {path: [pool.submit(sample_platform, path, index, tick_rate) for index in range(len(world.platforms))]
+                   for path, world in worlds.items()}
+        reports = []
+        for path, world in worlds.items():
+            spawn_platform, flag_at_spawn = find_spawn_platform(world)
+            results = [future.result() for future in futures[path]]
+            reports.append(build_report(path, world, results, spawn_platform, flag_at_spawn))
+    return reports
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that Pixel Peak levels can be completed")
+    parser.add_argument('levels', nargs='+')
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument('--tick-rate', type=int, default=DEFAULT_TICK_RATE)
+    parser.add_argument('--json', help="write the reachability graphs to this file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    reports = analyze_levels(args.levels, args.workers, args.tick_rate)
+    elapsed = time.perf_counter() - start
+
+    failures = 0
+    for report in reports:
+        solvable = report['flag_reachable'] or not report['has_flag']
+        failures += not solvable
+        print(f"{report['level']}: {len(report['reachable'])}/{report['platforms']} platforms reachable, "
+              f"flag {'reachable' if report['flag_reachable'] else 'UNREACHABLE'}")
+        if report['unreachable']:
+            print(f"    unreachable platforms: {report['unreachable']}")
+    print(f"{len(reports)} levels in {elapsed:.1f} s, {failures} unsolvable")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as report_file:
+            json.dump(reports, report_file, indent=2)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
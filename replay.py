@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+# Input recording and headless replay for Pixel Peak.
+#
+# InputRecorder captures one play session as the frame times and InputState the game fed
+# to World.advance()/step(), plus the keys pressed (on_key_down), and the final state.
+# Because the simulation is deterministic for a given level, frame-time sequence and
+# input stream, replay() runs the session again without pgzero, rendering or a frame cap
+# and ends in the same state, so a recording doubles as a regression check and a
+# reproducible performance trace. Sessions resumed from a checkpoint also store the
+# checkpoint's world snapshot and are replayed from that point.
+#
+#   python replay.py replays/replay_20260101_120000.json
+#   python replay.py replays/*.json --repeat 20 --profile
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import time
+
+from levels import load_level
+from world import OUTCOME_PLAYING, InputState, Rect, WorldSnapshot
+
+REPLAY_VERSION = 1
+REPLAY_DIRECTORY = 'replays'
+
+# Inputs are stored as a bit mask per frame.
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_JUMP = 4
+
+# A key-down on one of these ends the recorded session.
+SESSION_END_KEYS = {'ESCAPE'}
+
+def pack_input(inputs):
+    return (INPUT_LEFT if inputs.left else 0) | (INPUT_RIGHT if inputs.right else 0) | (INPUT_JUMP if inputs.jump else 0)
+
+def unpack_input(bits):
+    return InputState(left=bool(bits & INPUT_LEFT), right=bool(bits & INPUT_RIGHT), jump=bool(bits & INPUT_JUMP))
+
+def new_replay_path(directory=REPLAY_DIRECTORY):
+    # replay_<date>_<time>.json, with _2, _3, ... appended for sessions that end in the
+    # same second as an earlier one.
+    stamp = time.strftime("replay_%Y%m%d_%H%M%S")
+    path = os.path.join(directory, f"{stamp}.json")
+    suffix = 2
+    while os.path.exists(path):
+        path = os.path.join(directory, f"{stamp}_{suffix}.json")
+        suffix += 1
+    return path
+
+def summarize_world(world):
+    return {
+        'outcome': world.outcome,
+        'ticks': world.ticks,
+        'player': [world.player.x, world.player.y],
+        'enemies_left': len(world.swarm) if world.swarm is not None else len(world.enemies),
+        'defeated_enemies': sorted(world.defeated_enemy_ids),
+    }
+
+
+class InputRecorder:
+    def __init__(self, level_file, tick_rate, max_steps_per_frame, fixed_timestep=True, start_snapshot=None):
+        self.recording = {
+            'version': REPLAY_VERSION,
+            'level': level_file,
+            'tick_rate': tick_rate,
+            'max_steps_per_frame': max_steps_per_frame,
+            'fixed_timestep': fixed_timestep,
+            'frames': [],   # [dt, input bits] or [dt, input bits, [update region]]
+            'keys': [],     # [frame index, key name]
+        }
+        # Sessions that didn't start at the beginning of the level (resumed checkpoints).
+        if start_snapshot is not None:
+            self.recording['start'] = start_snapshot.to_dict()
+
+    def record_frame(self, dt, inputs, update_region=None):
+        frame = [dt, pack_input(inputs)]
+        if update_region is not None:
+            frame.append(list(update_region))
+        self.recording['frames'].append(frame)
+
+    def record_key(self, key_name):
+        self.recording['keys'].append([len(self.recording['frames']), key_name])
+
+    def save(self, path, world):
+        self.recording['final'] = summarize_world(world)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 'x': a recording is never written over another one.
+        with open(path, 'x', encoding='utf-8') as replay_file:
+            json.dump(self.recording, replay_file, separators=(',', ':'))
+
+
+def read_recording(path):
+    with open(path, encoding='utf-8') as replay_file:
+        recording = json.load(replay_file)
+    if recording.get('version') != REPLAY_VERSION:
+        raise ValueError(f"{path}: unsupported replay version {recording.get('version')}")
+    return recording
+
+def replay(recording):
+    # Feeds the recorded frames through a fresh World as fast as possible, mirroring the
+    # order of calls in main.update(), and returns the final state.
+    level = load_level(recording['level'], tick_rate=recording['tick_rate'],
+                       max_steps_per_frame=recording['max_steps_per_frame'])
+    world = level.world
+    if 'start' in recording:
+        world.restore(WorldSnapshot.from_dict(recording['start'], world))
+    session_end = min((frame_index for frame_index, key_name in recording['keys'] if key_name in SESSION_END_KEYS),
+                      default=len(recording['frames']))
+    frames_played = 0
+    try:
+        for frame in recording['frames'][:session_end]:
+            dt, bits = frame[0], frame[1]
+            world.update_region = Rect(*frame[2]) if len(frame) > 2 else None
+            if recording['fixed_timestep']:
+                world.advance(dt, unpack_input(bits))
+            else:
+                world.step(dt, unpack_input(bits))
+            level.stream(world.player.x)
+            frames_played += 1
+            if world.outcome != OUTCOME_PLAYING:
+                break
+    finally:
+        level.close()
+
+    result = summarize_world(world)
+    result['frames'] = frames_played
+    result['game_time'] = sum(frame[0] for frame in recording['frames'][:frames_played])
+    return result
+
+def check_replay(recording, result):
+    # Differences between the recorded final state and a replay's, as readable strings.
+    expected = recording.get('final')
+    if expected is None:
+        return []
+    return [f"{key}: recorded {expected[key]!r}, replayed {result[key]!r}"
+            for key in expected if result.get(key) != expected[key]]
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded Pixel Peak sessions headless and uncapped")
+    parser.add_argument('recordings', nargs='+')
+    parser.add_argument('--repeat', type=int, default=1, help="replay each recording this many times for timing")
+    parser.add_argument('--profile', action='store_true', help="print the hottest functions across all replays")
+    args = parser.parse_args()
+
+    profiler = cProfile.Profile() if args.profile else None
+    failures = 0
+    for path in args.recordings:
+        recording = read_recording(path)
+        start = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        for _ in range(args.repeat):
+            result = replay(recording)
+        if profiler:
+            profiler.disable()
+        elapsed = (time.perf_counter() - start) / args.repeat
+
+        mismatches = check_replay(recording, result)
+        failures += bool(mismatches)
+        speed = result['game_time'] / elapsed if elapsed > 0 else float('inf')
+        print(f"{path}: {result['outcome']} after {result['frames']} frames / {result['ticks']} ticks, "
+              f"{elapsed * 1000:.1f} ms ({speed:.0f}x real time) - {'MISMATCH' if mismatches else 'ok'}")
+        for mismatch in mismatches:
+            print(f"    {mismatch}")
+
+    if profiler:
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
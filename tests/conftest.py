@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Shared fixtures for the Pixel Peak checks. main.py is loaded once per session the same
+# way benchmark.py loads it, on SDL's dummy video and audio drivers.
+import os
+import sys
+
+import pytest
+
+GAME_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, GAME_DIRECTORY)
+
+@pytest.fixture(scope='session')
+def game():
+    from benchmark import load_game_module
+    game = load_game_module()
+    game.sound_mixer.set_enabled(False)
+    game.preloader.finish()
+    return game
+
+@pytest.fixture
+def level_game(game, monkeypatch):
+    # main.py in game on its default level, fed inputs from the returned list's last entry.
+    from world import NO_INPUT
+    inputs = [NO_INPUT]
+    monkeypatch.setattr(game, 'read_input', lambda: inputs[-1])
+    monkeypatch.setattr(game, 'LEVEL_FILE', game.DEFAULT_LEVEL_FILE)
+    game.current_game_state = game.GAME_STATE_IN_GAME
+    game.initialize_game_elements()
+    yield game, inputs
+    game.current_game_state = game.GAME_STATE_MAIN_MENU
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# Swept collision must only differ from the old move-then-overlap steps when a step is
+# long enough to carry a body through a platform.
+import random
+
+import pytest
+
+import world
+from benchmark import make_synthetic_level
+from levels import DEFAULT_LEVEL_FILE, build_world, load_level
+from world import OUTCOME_PLAYING, PLATFORM_FLOATING, InputState, Platform, PlayerBody, Rect, World
+
+def _discrete_x(body, candidates, dx):
+    body.x += dx
+    return []
+
+def _discrete_y(body, candidates, dy):
+    body.y += dy
+    return []
+
+def _player_trace(seed, level_data=None, tick_rate=120, seconds=20):
+    if level_data is None:
+        game_world = load_level(DEFAULT_LEVEL_FILE, tick_rate=tick_rate, batched_enemies=False).world
+    else:
+        game_world = build_world(level_data, batched_enemies=False)
+    rng = random.Random(seed)
+    inputs = InputState(False, False, False)
+    trace = []
+    for tick in range(seconds * tick_rate):
+        if tick % 20 == 0:
+            inputs = InputState(left=rng.random() < 0.45, right=rng.random() < 0.45, jump=rng.random() < 0.4)
+        game_world.step(1 / tick_rate, inputs)
+        trace.append((game_world.player.left, game_world.player.top, game_world.outcome))
+        if game_world.outcome != OUTCOME_PLAYING:
+            break
+    return trace
+
+@pytest.mark.parametrize('seed', range(8))
+def test_sweeps_match_discrete_steps_at_normal_tick_rate(seed, monkeypatch):
+    swept = _player_trace(seed)
+    monkeypatch.setattr(world, 'sweep_x', _discrete_x)
+    monkeypatch.setattr(world, 'sweep_y', _discrete_y)
+    assert _player_trace(seed) == swept
+
+# Synthetic levels stack trampolines and floating platforms closer than the hand-made
+# ones; these seeds include runs that once landed a tick early or bounced off two trampolines.
+@pytest.mark.parametrize('seed', [2, 12, 24, 31])
+def test_sweeps_match_discrete_steps_on_synthetic_levels(seed, monkeypatch):
+    level_data = make_synthetic_level(40, 20, 5, seed=seed)
+    swept = _player_trace(seed, level_data)
+    monkeypatch.setattr(world, 'sweep_x', _discrete_x)
+    monkeypatch.setattr(world, 'sweep_y', _discrete_y)
+    assert _player_trace(seed, level_data) == swept
+
+def test_long_fall_lands_on_thin_platform():
+    platform_data = Platform(PLATFORM_FLOATING, Rect(0, 400, 400, 20))
+    player = PlayerBody((200, 100))
+    player.on_ground = False
+    player.vy = 1500
+    game_world = World([platform_data], [], None, player=player, batched_enemies=False)
+    game_world.step(1.0)
+    assert player.bottom == platform_data.rect.top
+    assert player.on_ground
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+# EnemySwarm runs EnemyBody.update's rules for a whole level at once; both paths have to
+# move every enemy the same way, tick for tick.
+import random
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from perf import monitor
+from world import (GROUND_TOP_Y, PLATFORM_FLOATING, PLATFORM_KINDS, EnemyBody, FlagBody, InputState, Platform,
+                   PlayerBody, Rect, World)
+
+def _crowded_world(batched, seed, enemy_count=200, width=6000):
+    # Overlapping floating platforms, enemies dropped slightly above, on and below their
+    # surfaces, both platform-bound and free walkers.
+    rng = random.Random(seed)
+    platforms = [Platform(PLATFORM_KINDS['ground'], Rect(0, GROUND_TOP_Y, width, 50))]
+    for _ in range(150):
+        platforms.append(Platform(PLATFORM_FLOATING, Rect(rng.randrange(0, width - 200), rng.randrange(100, 600),
+                                                          64 * rng.randrange(2, 6), 50)))
+    enemies = []
+    for _ in range(enemy_count):
+        rect = rng.choice(platforms).rect
+        bound = rect.width < width and rng.random() < 0.7
+        x = rng.uniform(rect.left + 32, rect.right - 32)
+        enemies.append(EnemyBody((x, rect.top + rng.choice([0, 0, 3, -4, 20])), (rect.left, rect.right),
+                                 rect if bound else None))
+    return World(platforms, enemies, FlagBody((width - 1000, 100)), player=PlayerBody((width - 100, GROUND_TOP_Y - 400)),
+                 width=width, batched_enemies=batched)
+
+@pytest.mark.parametrize('seed', range(3))
+def test_swarm_moves_in_lockstep_with_enemy_bodies(seed, monkeypatch):
+    # Keep both worlds running past a lost or won game, so every tick is compared.
+    monkeypatch.setattr(World, 'finish', lambda self, outcome, event: self.events.append(event))
+    bodies = _crowded_world(False, seed)
+    swarm_world = _crowded_world(True, seed)
+    swarm = swarm_world.swarm
+    for tick in range(600):
+        inputs = InputState(left=tick % 200 < 100, right=tick % 200 >= 100, jump=tick % 37 == 0)
+        assert bodies.step(1 / 120, inputs) == swarm_world.step(1 / 120, inputs), tick
+        assert len(bodies.enemies) == swarm.count, tick
+        assert [enemy.left for enemy in bodies.enemies] == pytest.approx(swarm.x, abs=1e-6), tick
+        assert [enemy.top for enemy in bodies.enemies] == pytest.approx(swarm.y, abs=1e-6), tick
+        assert [enemy.is_squashed for enemy in bodies.enemies] == swarm.is_squashed.tolist(), tick
+        assert [enemy.animation.frame_index for enemy in bodies.enemies] == swarm.current_frame_index.tolist(), tick
+
+def test_swarm_counts_its_platform_tests():
+    swarm_world = _crowded_world(True, 0)
+    monitor.enable()
+    try:
+        monitor.begin_frame()
+        swarm_world.swarm.update(swarm_world, 1 / 120)
+        assert monitor.counters['colliderect'] > 0
+    finally:
+        monitor.disable()
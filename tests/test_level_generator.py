@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+import json
+
+from level_generator import enemy_span, ensure_level, generate_level, validate_level
+
+def test_same_seed_same_level():
+    assert generate_level(7) == generate_level(7)
+    assert generate_level(7) != generate_level(8)
+
+def test_generated_levels_pass_validation():
+    for seed in range(500):
+        assert validate_level(generate_level(seed)) == [], f"seed {seed}"
+
+def test_validation_catches_enemy_on_flag_surface():
+    level = generate_level(3)
+    flag_x, flag_y = level['flag']
+    level['enemies'].append({'start_pos': [flag_x, flag_y + 30], 'movement_range': [flag_x - 100, flag_x + 100]})
+    assert validate_level(level) == [f"enemy {len(level['enemies']) - 1} patrols the flag's surface"]
+    assert enemy_span(level['enemies'][-1], level['platforms']) == (flag_x - 100, flag_x + 100)
+
+def test_cached_level_is_reused(tmp_path):
+    path = ensure_level(11, str(tmp_path))
+    with open(path, encoding='utf-8') as level_file:
+        assert json.load(level_file) == generate_level(11)
+    assert ensure_level(11, str(tmp_path)) == path
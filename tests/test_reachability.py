@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# reachability.py has to find every platform a player can get to, the flag's included.
+import json
+
+from reachability import analyze_levels
+from world import GROUND_TOP_Y, HEIGHT
+
+def test_flag_platform_is_reachable(tmp_path):
+    # The flag covers the whole of the step it stands on, so every flight that lands there
+    # touches it first.
+    path = tmp_path / 'step.json'
+    path.write_text(json.dumps({
+        'version': 1,
+        'width': 800,
+        'height': HEIGHT,
+        'player_start': [100, GROUND_TOP_Y],
+        'platforms': [{'type': 'ground', 'rect': [0, GROUND_TOP_Y, 800, 50]},
+                      {'type': 'floating', 'rect': [464, GROUND_TOP_Y - 100, 64, 50]}],
+        'flag': [496, GROUND_TOP_Y - 132],
+    }))
+    report, = analyze_levels([str(path)], workers=1)
+    assert report['flag_reachable']
+    assert report['unreachable'] == []
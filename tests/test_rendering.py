@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# Dirty-rectangle rendering must leave the screen exactly as a full redraw would.
+import random
+
+import pygame
+
+from world import InputState
+
+def _screen_bytes(game):
+    return pygame.image.tobytes(game.screen.surface, 'RGB')
+
+def _draw_both_ways(game, monkeypatch):
+    # Draws the frame with dirty rectangles, then again in full over the same surface;
+    # returns both buffers and whether the first draw was a partial one.
+    monkeypatch.setattr(game, 'DIRTY_RECT_RENDERING', True)
+    game.draw()
+    partial = game.presented_rects is not None
+    dirty = _screen_bytes(game)
+    monkeypatch.setattr(game, 'DIRTY_RECT_RENDERING', False)
+    game.draw()
+    return dirty, _screen_bytes(game), partial
+
+def test_dirty_rects_match_full_redraw(level_game, monkeypatch):
+    game, inputs = level_game
+    rng = random.Random(1)
+    partial_frames = 0
+    for frame in range(400):
+        if frame % 15 == 0:
+            inputs.append(InputState(left=rng.random() < 0.4, right=rng.random() < 0.4, jump=rng.random() < 0.3))
+        game.update(1 / 60 + rng.random() * 0.01)
+        dirty, full, partial = _draw_both_ways(game, monkeypatch)
+        assert dirty == full, f"frame {frame} differs from a full redraw"
+        partial_frames += partial
+        if game.current_game_state != game.GAME_STATE_IN_GAME:
+            game.current_game_state = game.GAME_STATE_IN_GAME
+            game.initialize_game_elements()
+    assert partial_frames > 100
+
+def test_hiding_perf_overlay_redraws_in_full(level_game, monkeypatch):
+    game, _ = level_game
+    monkeypatch.setattr(game, 'DIRTY_RECT_RENDERING', True)
+    game.update(1 / 60)
+    game.draw()
+    game.on_key_down(game.keys.F3)
+    game.update(1 / 60)
+    game.draw()
+    game.on_key_down(game.keys.F3)
+    assert not game.perf_overlay_visible
+
+    game.update(1 / 60)
+    dirty, full, partial = _draw_both_ways(game, monkeypatch)
+    assert not partial
+    assert dirty == full
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# A session recorded through main.update() has to replay headless to the same end state.
+import glob
+import os
+import random
+
+import pytest
+
+from replay import read_recording, replay
+from world import InputState
+
+@pytest.mark.parametrize('fixed_timestep', [True, False])
+def test_recorded_session_replays_to_the_same_state(level_game, tmp_path, monkeypatch, fixed_timestep):
+    game, inputs = level_game
+    monkeypatch.setattr(game, 'FIXED_TIMESTEP_ENABLED', fixed_timestep)
+    monkeypatch.setattr(game, 'RECORD_INPUT', True)
+    monkeypatch.setattr(game, 'REPLAY_DIRECTORY', str(tmp_path))
+    game.initialize_game_elements()
+
+    # Uneven frame times, so the fixed-timestep accumulator carries remainders over.
+    rng = random.Random(3)
+    for frame in range(600):
+        if frame % 15 == 0:
+            inputs.append(InputState(left=rng.random() < 0.3, right=rng.random() < 0.6, jump=rng.random() < 0.3))
+        game.update(1 / 60 + rng.random() * 0.02)
+        if game.current_game_state != game.GAME_STATE_IN_GAME:
+            break
+    else:
+        game.on_key_down(game.keys.ESCAPE)
+
+    paths = glob.glob(os.path.join(str(tmp_path), '*.json'))
+    assert len(paths) == 1
+    recording = read_recording(paths[0])
+    result = replay(recording)
+    assert result['ticks'] > 0
+    for key, recorded in recording['final'].items():
+        assert result[key] == recorded, key
+    assert result['player'] == [game.world.player.x, game.world.player.y]
+
+def test_sessions_ending_in_the_same_second_keep_both_recordings(level_game, tmp_path, monkeypatch):
+    game, _ = level_game
+    monkeypatch.setattr(game, 'RECORD_INPUT', True)
+    monkeypatch.setattr(game, 'REPLAY_DIRECTORY', str(tmp_path))
+    monkeypatch.setattr('time.strftime', lambda pattern: 'replay_20260101_120000')
+    for _ in range(2):
+        game.current_game_state = game.GAME_STATE_IN_GAME
+        game.initialize_game_elements()
+        game.update(1 / 60)
+        game.on_key_down(game.keys.ESCAPE)
+    assert sorted(os.listdir(str(tmp_path))) == ['replay_20260101_120000.json', 'replay_20260101_120000_2.json']
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+# Streamed (.ppk) levels only hold the chunks around the player; nothing outside them may
+# be lost because its ground isn't loaded.
+import pytest
+
+from levels import StreamingLevel, pack_level
+from world import GROUND_TOP_Y, HEIGHT
+
+def _segmented_level(width=6000, segment_width=512):
+    return {
+        'version': 1,
+        'width': width,
+        'height': HEIGHT,
+        'player_start': [100, GROUND_TOP_Y],
+        'platforms': [{'type': 'ground', 'rect': [x, GROUND_TOP_Y, segment_width, 50]}
+                      for x in range(0, width, segment_width)],
+        'enemies': [{'start_pos': [2000, GROUND_TOP_Y], 'movement_range': [1500, 4000]}],
+        'flag': [width - 100, GROUND_TOP_Y - 32],
+    }
+
+@pytest.mark.parametrize('batched', [False, True])
+def test_enemies_wait_at_the_edge_of_the_loaded_chunks(tmp_path, batched):
+    if batched:
+        pytest.importorskip('numpy')
+    path = str(tmp_path / 'segmented.ppk')
+    pack_level(_segmented_level(), path)
+    level = StreamingLevel(path, batched_enemies=batched)
+    try:
+        game_world = level.world
+        for _ in range(30 * game_world.tick_rate):
+            game_world.step(1 / game_world.tick_rate)
+            level.stream(game_world.player.x)
+        assert not game_world.defeated_enemy_ids
+        if batched:
+            assert game_world.swarm.count == 1
+            assert game_world.swarm.y[0] + game_world.swarm.height == GROUND_TOP_Y
+        else:
+            assert len(game_world.enemies) == 1
+            assert game_world.enemies[0].bottom == GROUND_TOP_Y
+    finally:
+        level.close()
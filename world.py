@@ -0,0 +1,834 @@
+# -*- coding: utf-8 -*-
+# Headless simulation core for Pixel Peak.
+#
+# Everything that decides how the game plays (physics, collisions, trampolines, enemy
+# patrols and the win/lose rules) lives here as plain Python with no pgzero or pygame
+# dependency, so a World can be stepped thousands of times per second with no window or
+# audio. main.py is only a renderer and input adapter on top of it.
+from collections import namedtuple
+
+from animation import (ENEMY_SQUASHED, ENEMY_WALK_LEFT, ENEMY_WALK_RIGHT, FLAG_WAVE, PLAYER_IDLE,
+                       PLAYER_JUMP, PLAYER_WALK_LEFT, PLAYER_WALK_RIGHT, AnimationCursor, advance_cursors)
+from perf import monitor
+
+# --- Level Dimensions ---
+WIDTH = 1300
+HEIGHT = 700
+
+# Y position of the ground top
+GROUND_TOP_Y = HEIGHT - 50
+
+# --- Physics Settings ---
+TRAMPOLINE_JUMP_BOOST = -800
+TRAMPOLINE_ANIMATION_DURATION = 0.2
+
+PLAYER_SIZE = (128, 128)
+ENEMY_SIZE = (64, 64)
+FLAG_SIZE = (64, 64)
+
+DEFAULT_TICK_RATE = 120 # ticks per second
+DEFAULT_MAX_STEPS_PER_FRAME = 8
+
+# With batched_enemies left on auto, levels with at least this many enemies use the
+# NumPy EnemySwarm (when numpy is installed) instead of one EnemyBody per enemy.
+SWARM_MIN_ENEMIES = 64
+
+# --- Outcomes and Events ---
+OUTCOME_PLAYING = 'playing'
+OUTCOME_WON = 'won'
+OUTCOME_GAME_OVER = 'game_over'
+
+# Events returned by World.step() so the front end can play sounds and switch screens.
+EVENT_ENEMY_SQUASHED = 'enemy_squashed'
+EVENT_PLAYER_HIT = 'player_hit'
+EVENT_PLAYER_FELL = 'player_fell'
+EVENT_FLAG_COLLECTED = 'flag_collected'
+
+# --- Input ---
+InputState = namedtuple('InputState', ['left', 'right', 'jump'])
+NO_INPUT = InputState(False, False, False)
+
+# --- Geometry ---
+class Rect:
+    # Axis-aligned rectangle with the same field names and overlap rule as pygame.Rect.
+    # It also behaves as a 4-item sequence so pygame drawing calls accept it directly.
+    __slots__ = ('x', 'y', 'width', 'height')
+
+    def __init__(self, x, y, width, height):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    left = property(lambda self: self.x)
+    top = property(lambda self: self.y)
+    right = property(lambda self: self.x + self.width)
+    bottom = property(lambda self: self.y + self.height)
+    centerx = property(lambda self: self.x + self.width / 2)
+    centery = property(lambda self: self.y + self.height / 2)
+    topleft = property(lambda self: (self.x, self.y))
+    size = property(lambda self: (self.width, self.height))
+
+    def colliderect(self, other):
+        return (self.x < other.right and other.left < self.x + self.width and
+                self.y < other.bottom and other.top < self.y + self.height)
+
+    def clip(self, other):
+        # The overlap of both rectangles; zero-sized when they don't overlap.
+        left, top = max(self.x, other.left), max(self.y, other.top)
+        right, bottom = min(self.right, other.right), min(self.bottom, other.bottom)
+        if right <= left or bottom <= top:
+            return Rect(left, top, 0, 0)
+        return Rect(left, top, right - left, bottom - top)
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.width, self.height))
+
+    def __len__(self):
+        return 4
+
+    def __getitem__(self, index):
+        return (self.x, self.y, self.width, self.height)[index]
+
+    def __repr__(self):
+        return f"Rect({self.x}, {self.y}, {self.width}, {self.height})"
+
+
+# --- Platforms ---
+# Platform kinds as integer tags; level files spell them 'ground', 'floating' and 'trampoline'.
+PLATFORM_GROUND = 0
+PLATFORM_FLOATING = 1
+PLATFORM_TRAMPOLINE = 2
+PLATFORM_KINDS = {'ground': PLATFORM_GROUND, 'floating': PLATFORM_FLOATING, 'trampoline': PLATFORM_TRAMPOLINE}
+
+class Platform:
+    __slots__ = ('rect', 'kind', 'animation_timer')
+
+    def __init__(self, kind, rect):
+        self.rect = rect
+        self.kind = kind
+        # Time left on the trampoline's pressed-down frame; unused by other kinds.
+        self.animation_timer = 0.0
+
+
+class Body:
+    # Moving box anchored at its centre, mirroring how pgzero's Actor exposes x/y and
+    # the edge properties, so the collision code reads the same as it did on Actors.
+    # Bodies and their subclasses use __slots__, so levels with thousands of them stay small.
+    __slots__ = ('width', 'height', 'left', 'top', 'previous_pos')
+
+    def __init__(self, size):
+        self.width, self.height = size
+        self.left = 0.0
+        self.top = 0.0
+        self.previous_pos = None
+
+    def _get_x(self):
+        return self.left + self.width / 2
+
+    def _set_x(self, value):
+        self.left = value - self.width / 2
+
+    def _get_y(self):
+        return self.top + self.height / 2
+
+    def _set_y(self, value):
+        self.top = value - self.height / 2
+
+    def _get_right(self):
+        return self.left + self.width
+
+    def _set_right(self, value):
+        self.left = value - self.width
+
+    def _get_bottom(self):
+        return self.top + self.height
+
+    def _set_bottom(self, value):
+        self.top = value - self.height
+
+    def _get_pos(self):
+        return (self.x, self.y)
+
+    def _set_pos(self, pos):
+        self.x, self.y = pos
+
+    def _get_midbottom(self):
+        return (self.x, self.bottom)
+
+    def _set_midbottom(self, pos):
+        self.x, self.bottom = pos
+
+    x = property(_get_x, _set_x)
+    y = property(_get_y, _set_y)
+    right = property(_get_right, _set_right)
+    bottom = property(_get_bottom, _set_bottom)
+    pos = property(_get_pos, _set_pos)
+    midbottom = property(_get_midbottom, _set_midbottom)
+
+    def colliderect(self, other):
+        return (self.left < other.right and other.left < self.left + self.width and
+                self.top < other.bottom and other.top < self.top + self.height)
+
+
+# --- Collision Broadphase ---
+# Uniform grid keyed by cell coordinates. Static platforms are inserted once per level;
+# moving bodies are re-binned only when they cross into a different set of cells.
+BROADPHASE_CELL_SIZE = 128
+
+class SpatialHash:
+    def __init__(self, cell_size=BROADPHASE_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.entries = {}
+        self.next_order = 0
+
+    def _cell_range(self, bounds):
+        size = self.cell_size
+        return (int(bounds.left // size), int(bounds.top // size),
+                int(bounds.right // size), int(bounds.bottom // size))
+
+    def _add_to_cells(self, order, item, cell_range):
+        x0, y0, x1, y1 = cell_range
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = self.cells.get((cx, cy))
+                if cell is None:
+                    cell = self.cells[(cx, cy)] = {}
+                cell[order] = item
+
+    def _remove_from_cells(self, order, cell_range):
+        x0, y0, x1, y1 = cell_range
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = self.cells[(cx, cy)]
+                del cell[order]
+                if not cell:
+                    del self.cells[(cx, cy)]
+
+    def insert(self, item, bounds):
+        # The insertion order is kept so query results come back in the same order as the
+        # original lists, which the collision resolution depends on.
+        order = self.next_order
+        self.next_order += 1
+        cell_range = self._cell_range(bounds)
+        self.entries[id(item)] = (order, cell_range)
+        self._add_to_cells(order, item, cell_range)
+
+    def move(self, item, bounds):
+        order, old_range = self.entries[id(item)]
+        new_range = self._cell_range(bounds)
+        if new_range == old_range:
+            return
+        self._remove_from_cells(order, old_range)
+        self._add_to_cells(order, item, new_range)
+        self.entries[id(item)] = (order, new_range)
+
+    def remove(self, item):
+        entry = self.entries.pop(id(item), None)
+        if entry is not None:
+            self._remove_from_cells(*entry)
+
+    def query(self, bounds):
+        x0, y0, x1, y1 = self._cell_range(bounds)
+        if x0 == x1 and y0 == y1:
+            found = self.cells.get((x0, y0))
+            if not found:
+                return []
+        else:
+            found = {}
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    cell = self.cells.get((cx, cy))
+                    if cell:
+                        found.update(cell)
+        return [found[order] for order in sorted(found)]
+
+def build_platform_grid(platforms):
+    grid = SpatialHash()
+    for platform_data in platforms:
+        grid.insert(platform_data, platform_data.rect)
+    return grid
+
+# --- Swept Collision ---
+# Bodies move one axis at a time. Jumping straight to the end of a step and testing for
+# overlap there lets a fast body, or a long step, pass clean through a platform, so the
+# sweeps below stop the body on the first platform face in its way and return the
+# platforms it ended up touching. Platforms it already overlaps don't stop it; the
+# overlap checks that follow a sweep resolve those as before. Whenever a step is short
+# enough not to tunnel, the body ends where the discrete checks would have put it.
+def swept_bounds(body, dx, dy):
+    return Rect(min(body.left, body.left + dx), min(body.top, body.top + dy),
+                body.width + abs(dx), body.height + abs(dy))
+
+def _first_faces(faces, start, end):
+    # faces: (face position, platform) pairs. Returns the platforms whose face lies on the
+    # way from start to end, end excluded, that come first along that way.
+    if end > start:
+        crossed = [(face, platform_data) for face, platform_data in faces if start <= face < end]
+        first = min((face for face, _ in crossed), default=None)
+    else:
+        crossed = [(face, platform_data) for face, platform_data in faces if end < face <= start]
+        first = max((face for face, _ in crossed), default=None)
+    return [platform_data for face, platform_data in crossed if face == first]
+
+# The sweeps move the body first, with the same arithmetic as a plain step, and then
+# look for faces between the start and end positions. A face the body only touches at
+# the end is not crossed, matching colliderect(), so a step too short to tunnel ends
+# exactly where moving and testing for overlap would have left it.
+def sweep_x(body, candidates, dx):
+    start_left = body.left
+    body.x += dx
+    faces = [((platform_data.rect.left, platform_data) if dx > 0 else (platform_data.rect.right, platform_data))
+             for platform_data in candidates
+             if body.top < platform_data.rect.bottom and platform_data.rect.top < body.bottom]
+    if dx > 0:
+        contacts = _first_faces(faces, start_left + body.width, body.left + body.width)
+        if contacts:
+            body.right = contacts[0].rect.left
+    else:
+        contacts = _first_faces(faces, start_left, body.left)
+        if contacts:
+            body.left = contacts[0].rect.right
+    return contacts
+
+def sweep_y(body, candidates, dy):
+    start_top = body.top
+    body.y += dy
+    faces = [((platform_data.rect.top, platform_data) if dy > 0 else (platform_data.rect.bottom, platform_data))
+             for platform_data in candidates
+             if body.left < platform_data.rect.right and platform_data.rect.left < body.right]
+    if dy > 0:
+        contacts = _first_faces(faces, start_top + body.height, body.top + body.height)
+        if contacts:
+            body.bottom = contacts[0].rect.top
+    else:
+        contacts = _first_faces(faces, start_top, body.top)
+        if contacts:
+            body.top = contacts[0].rect.bottom
+    return contacts
+
+# --- Bodies (Player, Enemy, Flag) ---
+class PlayerBody(Body):
+    __slots__ = ('vx', 'vy', 'speed', 'jump_power', 'gravity', 'on_ground', 'animation')
+
+    def __init__(self, start_pos=(WIDTH - 100, GROUND_TOP_Y)):
+        super().__init__(PLAYER_SIZE)
+        self.midbottom = start_pos
+        self.vx = 0
+        self.vy = 0
+        self.speed = 300
+        self.jump_power = -570
+        self.gravity = 800
+        self.on_ground = True
+
+        self.animation = AnimationCursor(PLAYER_IDLE)
+
+    def get_state(self):
+        return (self.left, self.top, self.vx, self.vy, self.on_ground, self.animation.get_state())
+
+    def set_state(self, state):
+        self.left, self.top, self.vx, self.vy, self.on_ground, animation_state = state
+        self.animation.set_state(animation_state)
+        self.previous_pos = None
+
+    def update(self, world, dt, inputs):
+        # The clip to show is worked out along the way and handed to the cursor once,
+        # after the collisions, so in-between states within one tick don't restart it.
+        clip = self.animation.clip
+        walk_clip = PLAYER_WALK_RIGHT
+
+        self.vx = 0
+        is_moving_horizontally = False
+
+        if inputs.left:
+            self.vx = -self.speed
+            walk_clip = PLAYER_WALK_LEFT
+            is_moving_horizontally = True
+        elif inputs.right:
+            self.vx = self.speed
+            is_moving_horizontally = True
+
+        if not self.on_ground:
+            self.vy += self.gravity * dt
+            if self.vy > 500:
+                self.vy = 500
+
+        if inputs.jump and self.on_ground:
+            self.vy = self.jump_power
+            self.on_ground = False
+            clip = PLAYER_JUMP
+
+        if not self.on_ground:
+            if self.vy != 0:
+                clip = PLAYER_JUMP
+        elif is_moving_horizontally:
+            clip = walk_clip
+        else:
+            clip = PLAYER_IDLE
+
+        dx = self.vx * dt
+        candidates = world.platform_grid.query(swept_bounds(self, dx, 0))
+        monitor.count('colliderect', len(candidates))
+        sweep_x(self, candidates, dx)
+        for platform_data in candidates:
+            platform_rect = platform_data.rect
+            if self.colliderect(platform_rect):
+                if self.vx > 0:
+                    self.right = platform_rect.left
+                elif self.vx < 0:
+                    self.left = platform_rect.right
+
+        if self.left < 0:
+            self.left = 0
+            self.vx = 0
+        if self.right > world.width:
+            self.right = world.width
+            self.vx = 0
+
+        dy = self.vy * dt
+        was_on_ground_this_frame = False
+
+        candidates = world.platform_grid.query(swept_bounds(self, 0, dy))
+        monitor.count('colliderect', len(candidates))
+        # Only the first platform the sweep stopped on counts as a hit: the body now just
+        # touches the rest, as it would after the overlap check had snapped it to the first.
+        contacts = sweep_y(self, candidates, dy)
+        stopped_on = contacts[0] if contacts else None
+        for platform_data in candidates:
+            platform_rect = platform_data.rect
+            if platform_data is stopped_on or self.colliderect(platform_rect):
+                if self.vy >= 0:
+                    self.bottom = platform_rect.top
+                    self.vy = 0
+                    was_on_ground_this_frame = True
+
+                    if platform_data.kind == PLATFORM_TRAMPOLINE:
+                        self.vy = TRAMPOLINE_JUMP_BOOST
+                        self.on_ground = False
+                        clip = PLAYER_JUMP
+                        platform_data.animation_timer = TRAMPOLINE_ANIMATION_DURATION
+
+                    if clip is PLAYER_JUMP:
+                        clip = walk_clip if is_moving_horizontally else PLAYER_IDLE
+
+                elif self.vy < 0:
+                    self.top = platform_rect.bottom
+                    self.vy = 0
+                    clip = PLAYER_JUMP
+
+        self.animation.play(clip)
+
+        # --- Enemy Collision Logic ---
+        candidates = world.enemy_grid.query(self)
+        monitor.count('colliderect', len(candidates))
+        for enemy in candidates:
+            if not enemy.is_squashed and self.colliderect(enemy):
+                if self.vy >= 0 and self.bottom <= enemy.top + (enemy.height / 3):
+                    enemy.squash(world)
+                    self.vy = self.jump_power / 2
+                    self.on_ground = False
+                else:
+                    world.finish(OUTCOME_GAME_OVER, EVENT_PLAYER_HIT)
+                    return
+
+        # --- Flag Collision Logic ---
+        flag = world.flag
+        if flag and not flag.collected and self.colliderect(flag):
+            flag.collect()
+            world.finish(OUTCOME_WON, EVENT_FLAG_COLLECTED)
+            return
+
+        self.on_ground = was_on_ground_this_frame
+
+        if self.top > world.height:
+            world.finish(OUTCOME_GAME_OVER, EVENT_PLAYER_FELL)
+            return
+
+
+class EnemyBody(Body):
+    __slots__ = ('speed', 'vx', 'movement_start', 'movement_end', 'platform_rect', 'on_ground', 'spawn_id',
+                 'animation', 'is_squashed', 'squashed_timer')
+
+    SQUASH_DURATION = 0.5
+
+    def __init__(self, start_pos, movement_range, platform_rect=None):
+        super().__init__(ENEMY_SIZE)
+        self.midbottom = start_pos
+        self.speed = 100
+        self.vx = self.speed
+        self.movement_start = movement_range[0]
+        self.movement_end = movement_range[1]
+        self.platform_rect = platform_rect
+        self.on_ground = False
+        # Identifies the enemy in its level file so streamed levels don't respawn it once defeated.
+        self.spawn_id = None
+
+        self.animation = AnimationCursor(ENEMY_WALK_RIGHT)
+
+        self.is_squashed = False
+        self.squashed_timer = 0.0
+
+    def get_state(self):
+        return (self.left, self.top, self.vx, self.on_ground, self.is_squashed, self.squashed_timer,
+                self.animation.get_state())
+
+    def set_state(self, state):
+        self.left, self.top, self.vx, self.on_ground, self.is_squashed, self.squashed_timer, animation_state = state
+        self.animation.set_state(animation_state)
+        self.previous_pos = None
+
+    def update(self, world, dt):
+        if world.outcome != OUTCOME_PLAYING:
+            return
+
+        if self.is_squashed:
+            self.squashed_timer -= dt
+            if self.squashed_timer <= 0:
+                world.remove_enemy(self)
+            return
+
+        self.x += self.vx * dt
+
+        if self.platform_rect:
+            if self.vx < 0 and self.left <= self.platform_rect.left:
+                self.left = self.platform_rect.left
+                self.vx = self.speed
+                self.animation.play(ENEMY_WALK_RIGHT, restart=False)
+            elif self.vx > 0 and self.right >= self.platform_rect.right:
+                self.right = self.platform_rect.right
+                self.vx = -self.speed
+                self.animation.play(ENEMY_WALK_LEFT, restart=False)
+        else:
+            if (self.vx < 0 and self.left <= self.movement_start) or \
+               (self.vx > 0 and self.right >= self.movement_end):
+                self.vx *= -1
+                self.animation.play(ENEMY_WALK_LEFT if self.vx < 0 else ENEMY_WALK_RIGHT, restart=False)
+
+        self.on_ground = False
+        candidates = world.platform_grid.query(self)
+        monitor.count('colliderect', len(candidates))
+        for platform_data in candidates:
+            platform_rect = platform_data.rect
+            if self.colliderect(platform_rect) and \
+               self.bottom <= platform_rect.top + 5 and \
+               self.bottom >= platform_rect.top - 5:
+                self.bottom = platform_rect.top
+                self.on_ground = True
+                break
+
+        if not self.on_ground:
+            fall = 150 * dt
+            # A long step can carry the feet past a platform's 5px snap band in one go;
+            # the enemy then lands on the first platform top it crossed.
+            landing_top = None
+            for platform_data in world.platform_grid.query(swept_bounds(self, 0, fall)):
+                platform_rect = platform_data.rect
+                if self.left < platform_rect.right and platform_rect.left < self.right and \
+                   self.bottom <= platform_rect.top + 5 < self.bottom + fall and \
+                   (landing_top is None or platform_rect.top < landing_top):
+                    landing_top = platform_rect.top
+            if landing_top is not None:
+                self.bottom = landing_top
+            else:
+                self.y += fall
+            if self.top > world.height:
+                self.is_squashed = True
+                self.squashed_timer = 0
+                self.animation.play(ENEMY_SQUASHED)
+
+        world.enemy_grid.move(self, self)
+
+    def squash(self, world):
+        self.is_squashed = True
+        self.squashed_timer = self.SQUASH_DURATION
+        self.animation.play(ENEMY_SQUASHED)
+        world.events.append(EVENT_ENEMY_SQUASHED)
+
+
+class FlagBody(Body):
+    __slots__ = ('collected', 'animation')
+
+    def __init__(self, pos):
+        super().__init__(FLAG_SIZE)
+        self.pos = pos
+        self.collected = False
+
+        self.animation = AnimationCursor(FLAG_WAVE)
+
+    def get_state(self):
+        return (self.collected, self.animation.get_state())
+
+    def set_state(self, state):
+        self.collected, animation_state = state
+        self.animation.set_state(animation_state)
+
+    def collect(self):
+        self.collected = True
+        self.animation.stop()
+
+# --- Snapshots ---
+class WorldSnapshot:
+    # Everything in a World that changes during play, as plain values, so World.restore()
+    # can put the same World back to that moment without rebuilding it. Level geometry is
+    # not copied: a snapshot only fits the World it was taken from or, through
+    # to_dict()/from_dict(), a freshly loaded copy of the same level.
+    __slots__ = ('ticks', 'outcome', 'accumulator', 'player', 'flag', 'enemies', 'swarm',
+                 'trampolines', 'defeated_enemy_ids')
+
+    def __init__(self, ticks, outcome, accumulator, player, flag, enemies, swarm, trampolines, defeated_enemy_ids):
+        self.ticks = ticks
+        self.outcome = outcome
+        self.accumulator = accumulator
+        self.player = player
+        self.flag = flag
+        self.enemies = enemies          # ((EnemyBody, state), ...) for per-object enemies
+        self.swarm = swarm              # EnemySwarm columns, or None
+        self.trampolines = trampolines  # animation_timer of each trampoline, in World order
+        self.defeated_enemy_ids = defeated_enemy_ids
+
+    def to_dict(self):
+        # JSON-ready form. Enemies are identified by spawn id instead of by object.
+        return {
+            'ticks': self.ticks,
+            'outcome': self.outcome,
+            'accumulator': self.accumulator,
+            'player': self.player,
+            'flag': self.flag,
+            'enemies': [[enemy.spawn_id, state] for enemy, state in self.enemies],
+            'swarm': [column.tolist() for column in self.swarm] if self.swarm is not None else None,
+            'trampolines': list(self.trampolines),
+            'defeated_enemy_ids': sorted(self.defeated_enemy_ids),
+        }
+
+    @classmethod
+    def from_dict(cls, data, world):
+        # world must be freshly loaded from the level the snapshot was taken in, so all of
+        # its enemies are still present to be matched by spawn id.
+        enemies_by_spawn_id = {enemy.spawn_id: enemy for enemy in world.enemies}
+        return cls(data['ticks'], data['outcome'], data['accumulator'], data['player'], data['flag'],
+                   tuple((enemies_by_spawn_id[spawn_id], state) for spawn_id, state in data['enemies']),
+                   world.swarm.state_from_lists(data['swarm']) if data['swarm'] is not None else None,
+                   tuple(data['trampolines']), frozenset(data['defeated_enemy_ids']))
+
+
+# --- World ---
+class World:
+    def __init__(self, platforms, enemies, flag, player=None, width=WIDTH, height=HEIGHT,
+                 tick_rate=DEFAULT_TICK_RATE, max_steps_per_frame=DEFAULT_MAX_STEPS_PER_FRAME,
+                 batched_enemies=None):
+        self.width = width
+        self.height = height
+        self.platforms = platforms
+        self.player = player if player is not None else PlayerBody()
+        self.enemies = enemies
+        self.flag = flag
+        self.outcome = OUTCOME_PLAYING
+        self.events = []
+        # When set to a Rect, only enemies overlapping it are updated; the rest stay
+        # frozen where they are. The front end points it at the camera's surroundings.
+        self.update_region = None
+        # Streamed levels set this to the span of their loaded chunks (set_loaded_span);
+        # enemies outside it wait at its edge instead of walking onto ground that isn't
+        # there and falling out of the world.
+        self.loaded_region = None
+        # Level areas whose static geometry changed (streamed in or out) since the front
+        # end last looked, and spawn ids of enemies that were squashed or fell.
+        self.changed_areas = []
+        self.defeated_enemy_ids = set()
+
+        self.tick_rate = tick_rate
+        self.max_steps_per_frame = max_steps_per_frame
+        self.accumulator = 0.0
+        self.render_alpha = 1.0
+        self.ticks = 0
+
+        self.trampolines = [platform_data for platform_data in platforms if platform_data.kind == PLATFORM_TRAMPOLINE]
+        self.platform_grid = build_platform_grid(platforms)
+
+        # batched_enemies: None picks the swarm automatically for large enemy counts,
+        # True requires it and False always keeps per-object EnemyBody updates.
+        self.swarm = None
+        if batched_enemies is None:
+            from enemy_swarm import numpy_available
+            batched_enemies = numpy_available() and len(enemies) >= SWARM_MIN_ENEMIES
+        if batched_enemies:
+            from enemy_swarm import EnemySwarm
+            self.swarm = EnemySwarm.from_bodies(enemies, platforms)
+            self.enemies = []
+            self.enemy_grid = self.swarm
+        else:
+            self.enemy_grid = SpatialHash()
+            for enemy in enemies:
+                self.enemy_grid.insert(enemy, enemy)
+
+    def finish(self, outcome, event):
+        self.outcome = outcome
+        self.events.append(event)
+
+    def remove_enemy(self, enemy):
+        if enemy in self.enemies:
+            self.enemies.remove(enemy)
+            self.enemy_grid.remove(enemy)
+            if enemy.spawn_id is not None:
+                self.defeated_enemy_ids.add(enemy.spawn_id)
+
+    # --- Level Streaming ---
+    def add_platform(self, platform_data):
+        self.platforms.append(platform_data)
+        self.platform_grid.insert(platform_data, platform_data.rect)
+        if platform_data.kind == PLATFORM_TRAMPOLINE:
+            self.trampolines.append(platform_data)
+        self.changed_areas.append(platform_data.rect)
+        if self.swarm is not None:
+            self.swarm.set_platforms(self.platforms)
+
+    def remove_platform(self, platform_data):
+        self.platforms.remove(platform_data)
+        self.platform_grid.remove(platform_data)
+        if platform_data.kind == PLATFORM_TRAMPOLINE:
+            self.trampolines.remove(platform_data)
+        self.changed_areas.append(platform_data.rect)
+        if self.swarm is not None:
+            self.swarm.set_platforms(self.platforms)
+
+    def add_enemies(self, enemies):
+        if self.swarm is not None:
+            self.swarm.add_many(enemies)
+            return
+        for enemy in enemies:
+            self.enemies.append(enemy)
+            self.enemy_grid.insert(enemy, enemy)
+
+    def set_loaded_span(self, left, right):
+        # Reaches a level height above and below the level, so enemies are held only by
+        # their x position: a body is dropped once it falls past the bottom anyway.
+        self.loaded_region = Rect(left, -self.height, right - left, self.height * 3)
+
+    def active_region(self):
+        # update_region narrowed to the loaded chunks, or None to update every enemy.
+        if self.loaded_region is None:
+            return self.update_region
+        if self.update_region is None:
+            return self.loaded_region
+        return self.update_region.clip(self.loaded_region)
+
+    def unload_enemies(self, left, right):
+        # Drops live enemies whose centre lies in [left, right) without counting them as
+        # defeated, and returns their spawn ids.
+        if self.swarm is not None:
+            return self.swarm.unload(left, right)
+        unloaded = [enemy for enemy in self.enemies if left <= enemy.x < right]
+        for enemy in unloaded:
+            self.enemies.remove(enemy)
+            self.enemy_grid.remove(enemy)
+        return [enemy.spawn_id for enemy in unloaded]
+
+    def step(self, dt, inputs=NO_INPUT):
+        # Advances the simulation by exactly dt seconds and returns the events it produced.
+        self.events = []
+        if self.outcome != OUTCOME_PLAYING:
+            return self.events
+
+        with monitor.phase('player'):
+            self.player.update(self, dt, inputs)
+
+        # Bodies updated this tick; their animations advance together afterwards, so
+        # enemies frozen outside update_region also hold their frame.
+        animated = [self.player.animation]
+        if self.flag:
+            animated.append(self.flag.animation)
+
+        with monitor.phase('enemies'):
+            region = self.active_region()
+            if self.swarm is not None:
+                self.swarm.update(self, dt, region)
+            else:
+                if region is not None:
+                    active_enemies = [enemy for enemy in self.enemy_grid.query(region) if enemy.colliderect(region)]
+                else:
+                    active_enemies = list(self.enemies)
+                for enemy in active_enemies:
+                    enemy.update(self, dt)
+                    animated.append(enemy.animation)
+
+        with monitor.phase('animation'):
+            advance_cursors(animated, dt)
+
+        with monitor.phase('trampolines'):
+            for platform_data in self.trampolines:
+                if platform_data.animation_timer > 0:
+                    platform_data.animation_timer -= dt
+                    if platform_data.animation_timer < 0:
+                        platform_data.animation_timer = 0
+
+        self.ticks += 1
+        return self.events
+
+    def advance(self, frame_dt, inputs=NO_INPUT):
+        # Fixed-timestep driver: frame time goes into an accumulator that is spent in
+        # 1/tick_rate steps, at most max_steps_per_frame of them per call. render_alpha
+        # is how far the leftover time reaches into the next tick, for interpolation.
+        step = 1.0 / self.tick_rate
+        self.accumulator += frame_dt
+        events = []
+        steps_taken = 0
+        while self.accumulator >= step and steps_taken < self.max_steps_per_frame:
+            self.player.previous_pos = self.player.pos
+            for enemy in self.enemies:
+                enemy.previous_pos = enemy.pos
+            if self.swarm is not None:
+                self.swarm.store_previous()
+
+            events.extend(self.step(step, inputs))
+            self.accumulator -= step
+            steps_taken += 1
+            if self.outcome != OUTCOME_PLAYING:
+                self.accumulator = 0.0
+                break
+
+        # Past the catch-up cap the remaining backlog is dropped, so a long stall slows the
+        # game down for a moment instead of spiralling into ever longer frames.
+        if self.accumulator >= step:
+            self.accumulator %= step
+        self.render_alpha = self.accumulator / step
+        return events
+
+    # --- Snapshots ---
+    def snapshot(self):
+        return WorldSnapshot(
+            self.ticks, self.outcome, self.accumulator,
+            self.player.get_state(),
+            self.flag.get_state() if self.flag else None,
+            tuple((enemy, enemy.get_state()) for enemy in self.enemies),
+            self.swarm.get_state() if self.swarm is not None else None,
+            tuple(platform_data.animation_timer for platform_data in self.trampolines),
+            frozenset(self.defeated_enemy_ids),
+        )
+
+    def restore(self, snapshot):
+        # Puts the world back to the moment the snapshot was taken. Enemies removed since
+        # then come back, in their original order.
+        self.ticks = snapshot.ticks
+        self.outcome = snapshot.outcome
+        self.accumulator = snapshot.accumulator
+        self.render_alpha = self.accumulator * self.tick_rate
+        self.events = []
+        self.changed_areas = []
+        self.defeated_enemy_ids = set(snapshot.defeated_enemy_ids)
+
+        self.player.set_state(snapshot.player)
+        if self.flag and snapshot.flag is not None:
+            self.flag.set_state(snapshot.flag)
+        for platform_data, animation_timer in zip(self.trampolines, snapshot.trampolines):
+            platform_data.animation_timer = animation_timer
+
+        if self.swarm is not None:
+            self.swarm.set_state(snapshot.swarm)
+        else:
+            self.enemies = []
+            self.enemy_grid = SpatialHash()
+            for enemy, state in snapshot.enemies:
+                enemy.set_state(state)
+                self.enemies.append(enemy)
+                self.enemy_grid.insert(enemy, enemy)